@@ -0,0 +1,188 @@
+"""The file contains AsyncDataHandler, the asyncio counterpart of DataHandler
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from authenticate import DataHandler
+from custom_exceptions import UserDoesNotExistsError
+import constants
+
+
+class AsyncDataHandler:
+    """Object to handle data from asyncio code
+
+    Each method is a coroutine running the blocking call of the same name of a DataHandler on a
+    pool of threads, so that the calls awaited together, e.g. with asyncio.gather, are made to
+    the database at the same time instead of one after the other. The two handlers share the
+    database, the cache and the graph, so the blocking DataHandler remains available next to
+    this one. The writes made at the same time change the graph one after the other, since
+    every change of the graph holds handler.graph_lock.
+
+    This works with every storage backend, since none of them has to be async itself.
+
+    InstanceAttributes:
+    - handler: the blocking handler whose calls are run
+    - executor: the threads the blocking calls are run on
+    """
+    handler: DataHandler
+    executor: ThreadPoolExecutor
+
+    def __init__(self, handler: Optional[DataHandler] = None,
+                 workers: int = constants.ASYNC_WORKERS) -> None:
+        """Initialize an async handler running the calls of <handler>
+
+        :param handler: the blocking handler, or None to create one connected to the database
+        chosen by constants.STORAGE_BACKEND
+        :param workers: the maximum number of calls made to the database at the same time
+
+        Precondition:
+        - workers >= 1
+        """
+        self.handler = handler if handler is not None else DataHandler()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    async def __aenter__(self) -> AsyncDataHandler:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the threads of this handler, once the calls already started are done"""
+        self.executor.shutdown()
+
+    async def register(self, user_id: str, user_data: dict) -> bool:
+        """ register a user to our app, see DataHandler.register """
+        return await self._run(self.handler.register, user_id, user_data)
+
+    async def sign_in(self, user_id: str) -> bool:
+        """ Sign in to the app, see DataHandler.sign_in """
+        return await self._run(self.handler.sign_in, user_id)
+
+    async def get_user_data(self, user_id: str) -> dict:
+        """Return data for a user as a dictionary, see DataHandler.get_user_data"""
+        return await self._run(self.handler.get_user_data, user_id)
+
+    async def get_users(self, user_ids: list[str]) -> dict[str, dict]:
+        """Return the data of the given users who exist, keyed by user ID, like
+        DataHandler.get_users
+
+        The chunks of users that are not cached are all read at the same time, so reading the
+        data of many users takes about as long as reading one chunk.
+
+        :param user_ids: the user IDs of the people, e.g. the friends of a user
+        """
+        users, missing = self.handler.get_cached_users(user_ids)
+        chunk_size = constants.GET_USERS_CHUNK_SIZE
+        chunks = await asyncio.gather(*(self._run(self.handler.read_users,
+                                                  missing[start:start + chunk_size])
+                                        for start in range(0, len(missing), chunk_size)))
+
+        for chunk in chunks:
+            users.update(chunk)
+
+        return users
+
+    async def get_friends(self, user_id: str) -> dict[str, dict]:
+        """Return the data of the friends of the given user who exist, keyed by user ID, see
+        get_users
+
+        :param user_id: The user ID of the person
+        """
+        user_data = await self.get_user_data(user_id)
+
+        return await self.get_users(user_data['friends'])
+
+    async def update_user_data(self, user_id: str, user_data: dict) -> bool:
+        """ Update the data of a user, see DataHandler.update_user_data """
+        return await self._run(self.handler.update_user_data, user_id, user_data)
+
+    async def get_all_data(self) -> Optional[list[dict]]:
+        """Return all the users data in the database, see DataHandler.get_all_data"""
+        return await self._run(self.handler.get_all_data)
+
+    async def get_data_updated_since(self, timestamp: float) -> list[dict]:
+        """Return the data of the users who were registered or updated after <timestamp>, see
+        DataHandler.get_data_updated_since
+        """
+        return await self._run(self.handler.get_data_updated_since, timestamp)
+
+    async def get_user_ids_deleted_since(self, timestamp: float) -> list[str]:
+        """Return the user IDs of the users who were deleted after <timestamp>, see
+        DataHandler.get_user_ids_deleted_since
+        """
+        return await self._run(self.handler.get_user_ids_deleted_since, timestamp)
+
+    async def get_all_user_ids(self) -> list[str]:
+        """Return the user IDs of all the users in the database, see
+        DataHandler.get_all_user_ids
+        """
+        return await self._run(self.handler.get_all_user_ids)
+
+    async def is_user(self, user_id: str) -> bool:
+        """ Return whether the user in in the database, see DataHandler.is_user """
+        return await self._run(self.handler.is_user, user_id)
+
+    async def add_friend(self, of: str, to: str) -> None:
+        """ Add friend to a user, see DataHandler.add_friend
+
+        The users who are not cached are checked to exist with one batched read of their user
+        IDs only, and the friendship is only written if both exist. Raise a
+        UserDoesNotExistsError if one of them does not.
+
+        :param of: the user who is adding friend
+        :param to: the user who is added friend
+
+        Precondition:
+        - of != to
+        """
+        users, missing = self.handler.get_cached_users([of, to])
+
+        if missing:
+            users.update(await self._run(self.handler.storage.get_users, missing, ['userID']))
+
+        if of not in users or to not in users:
+            raise UserDoesNotExistsError
+
+        await self._run(self.handler.add_friend, of, to)
+
+    async def un_friend(self, by: str, to: str) -> None:
+        """remove friend, see DataHandler.un_friend"""
+        await self._run(self.handler.un_friend, by, to)
+
+    async def delete_user(self, user_id: str) -> None:
+        """ Delete the user if it exists, see DataHandler.delete_user """
+        await self._run(self.handler.delete_user, user_id)
+
+    async def _run(self, function: Callable, *args: Any) -> Any:
+        """Return function(*args), called on one of the threads of this handler"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(function, *args))
+
+
+if __name__ == '__main__':
+    # The friends of a user are read at the same time with:
+
+    #     async with AsyncDataHandler() as handler:
+    #         friends = await handler.get_friends(user_id)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['asyncio',
+                          'functools',
+                          'concurrent.futures',
+                          'typing',
+                          'authenticate',
+                          'custom_exceptions',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
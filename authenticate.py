@@ -3,37 +3,162 @@
 By Eeshan Narula and Avnish Pasari
 """
 
+import atexit
 import csv
-from typing import Optional
-
-from firebase_admin.exceptions import FirebaseError
-
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import firestore
-
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Iterator, Optional
+
+from change_feed import ChangeFeed
 from custom_exceptions import DataDidNotLoadError, UserDoesNotExistsError
+from instrumentation import Instrumentation, instrumented
+from sqlite_storage import SQLiteBackend
+from storage import DocumentChange, StorageBackend
+from user_cache import UserCache
 import constants
 
+try:
+    from firestore_storage import FirestoreBackend
+except ImportError:
+    FirestoreBackend = None
+
 
 class DataHandler:
     """Object to handle data
 
     InstanceAttributes:
-    - cred: a certificate used to connect to the firebase server
-    - app: an object representing the firebase server
-    - db: an object representing firebase firestore database
+    - storage: the database the users are stored in
+    - graph: the friend recommendation graph patched by this handler whenever it changes the
+    data, or None if no graph is kept up to date
+    - graph_lock: the lock held while the graph is read or changed, since the feed changes it on
+    its own thread and AsyncDataHandler from its threads, while the screens read it
+    - recommendation_table: the table of recommendations computed ahead of time served to the
+    screens, or None if it was not used yet
+    - instrumentation: the record of the database operations made by each method of this
+    handler and of their latencies, or None if they are not recorded
+    - cache: the documents of the users recently read or written by this handler
+    - feed: the listener keeping the cache and the graph up to date with the changes made by
+    other sessions, or None if this handler does not listen to them
     """
-    cred: credentials.Certificate
-    app: firebase_admin.App
-    db: firebase_admin.firestore.client
+    storage: StorageBackend
+    graph: Optional[Any]
+    graph_lock: threading.RLock
+    recommendation_table: Optional[Any]
+    instrumentation: Optional[Instrumentation]
+    cache: UserCache
+    feed: Optional[ChangeFeed]
+
+    def __init__(self, storage: Optional[StorageBackend] = None,
+                 instrument: bool = constants.INSTRUMENT_DATA_HANDLER,
+                 cache_size: int = constants.USER_CACHE_SIZE,
+                 cache_ttl: float = constants.USER_CACHE_TTL,
+                 listen: bool = constants.LISTEN_FOR_CHANGES) -> None:
+        """Initialize a handler connected to the database
+
+        :param storage: the database the users are stored in, or None to use the database
+        chosen by constants.STORAGE_BACKEND
+        :param instrument: whether to record the database operations and latencies of the
+        methods of this handler, and write a summary of them when the app exits
+        :param cache_size: the maximum number of user documents cached
+        :param cache_ttl: the number of seconds a cached user document is served for
+        :param listen: whether to keep the cache and the graph up to date with the changes made
+        by other sessions, see start_listening
+        """
+        if storage is None:
+            if constants.STORAGE_BACKEND == 'sqlite':
+                storage = SQLiteBackend()
+            elif FirestoreBackend is not None:
+                storage = FirestoreBackend()
+            else:
+                raise ImportError('firebase-admin is required to use the firestore backend')
+
+        self.storage = storage
+
+        self.graph = None
+        self.graph_lock = threading.RLock()
+        self.recommendation_table = None
+        self.instrumentation = None
+        self.cache = UserCache(cache_size, cache_ttl)
+        self.feed = None
+
+        if instrument:
+            self.instrumentation = Instrumentation()
+            self.storage.instrument(self.instrumentation)
+
+            atexit.register(self.instrumentation.dump)
+
+        if listen:
+            self.start_listening()
+
+    def start_listening(self) -> ChangeFeed:
+        """Start keeping the cache and the graph of this handler up to date with the changes
+        of the users made by any session, and return the feed of those changes
+
+        The changes are pushed by the database to a ChangeFeed, which applies them on its own
+        thread, in batches, instead of the whole collection being read again. Other consumers of
+        the changes can be added with subscribe.
+        """
+        if self.feed is None:
+            self.feed = ChangeFeed(self.storage)
+            self.feed.add_consumer(self._apply_changes, self._resync)
+
+            atexit.register(self.stop_listening)
+
+        self.feed.start()
+
+        return self.feed
+
+    def subscribe(self, consumer: Callable[[list[DocumentChange]], None]) -> ChangeFeed:
+        """Deliver the batches of changes of the users made by any session to <consumer>, on
+        the thread of the feed, starting to listen to them if needed
+
+        :param consumer: a function called with each batch of changes, after they are applied to
+        the cache and the graph of this handler
+        """
+        feed = self.start_listening()
+        feed.add_consumer(consumer)
 
-    def __init__(self) -> None:
-        self.cred = credentials.Certificate(constants.KEYS)
-        self.app = firebase_admin.initialize_app(self.cred)
+        return feed
 
-        self.db = firestore.client()
+    def stop_listening(self) -> None:
+        """Stop listening to the changes of the users, if this handler listens to them"""
+        if self.feed is not None:
+            self.feed.stop()
 
+    def _apply_changes(self, changes: list[DocumentChange]) -> None:
+        """Apply a batch of changes of the users to the cache and the graph of this handler
+
+        Only the users already cached are refreshed, so that the first batches, which report
+        every user, do not fill the cache.
+
+        :param changes: the changes, with at most one change per user
+        """
+        with self.graph_lock:
+            for change in changes:
+                if change.kind == 'removed':
+                    self.cache.remove(change.user_id)
+
+                    if self.graph is not None:
+                        self.graph.remove_user(change.user_id)
+                else:
+                    self.cache.refresh(change.user_id, change.user_data)
+
+                    if self.graph is not None:
+                        self.graph.update_user(change.user_id, change.user_data)
+
+    def _resync(self) -> None:
+        """Drop the cache and the graph of this handler, after a batch of changes failed to be
+        applied to them, so that they are read from the database again when they are next used
+        """
+        with self.graph_lock:
+            self.cache.clear()
+            self.graph = None
+
+    @instrumented
     def register(self, user_id: str, user_data: dict) -> bool:
         """ register a user to our app
 
@@ -45,15 +170,24 @@ class DataHandler:
 
             user_data['userID'] = user_id
             user_data['friends'] = []
+            user_data.pop('updatedAt', None)
 
             try:
-                self.db.collection(constants.COLLECTION).document(user_id).set(user_data)
-                return True
-            except (ValueError, TypeError, FirebaseError):
+                self.storage.set_user(user_id, user_data)
+            except (ValueError, TypeError):
                 raise DataDidNotLoadError
 
+            self.cache.put(user_id, user_data)
+
+            with self.graph_lock:
+                if self.graph is not None:
+                    self.graph.add_user(user_data)
+
+            return True
+
         return False
 
+    @instrumented
     def sign_in(self, user_id: str) -> bool:
         """ Sign in to the app, and return weather the sure successfully signed in
 
@@ -62,96 +196,240 @@ class DataHandler:
         """
         return self.is_user(user_id)
 
+    @instrumented
     def get_user_data(self, user_id: str) -> dict:
         """Return data for a user as a dictionary
 
+        The data is served from the cache when it holds a fresh copy of it.
+
         :param user_id: The user ID of the person
         """
-        try:
-            user = self.db.collection(constants.COLLECTION).document(user_id).get()
+        user_data = self.cache.get(user_id)
+
+        if user_data is not None:
+            return user_data
+
+        user_data = self.storage.get_user(user_id)
+
+        if user_data is not None:
+            self.cache.put(user_id, user_data)
+
+            return user_data
+        else:
+            raise UserDoesNotExistsError
+
+    @instrumented
+    def get_users(self, user_ids: list[str]) -> dict[str, dict]:
+        """Return the data of the given users who exist, keyed by user ID
+
+        The users with a fresh copy in the cache are served from it, and the others are read in
+        chunks of constants.GET_USERS_CHUNK_SIZE users, with one batched read per chunk, so
+        showing the friends of a user costs a few round trips instead of one per friend.
+
+        :param user_ids: the user IDs of the people, e.g. the friends of a user
+        """
+        users, missing = self.get_cached_users(user_ids)
 
-            if user.exists:
-                return user.to_dict()
+        for start in range(0, len(missing), constants.GET_USERS_CHUNK_SIZE):
+            users.update(self.read_users(missing[start:start + constants.GET_USERS_CHUNK_SIZE]))
+
+        return users
+
+    def get_cached_users(self, user_ids: list[str]) -> tuple[dict[str, dict], list[str]]:
+        """Return the data of the given users with a fresh copy in the cache, keyed by user ID,
+        and the user IDs of the other users, without repeating any of them
+
+        :param user_ids: the user IDs of the people
+        """
+        users = {}
+        missing = []
+
+        for user_id in dict.fromkeys(user_ids):
+            user_data = self.cache.get(user_id)
+
+            if user_data is not None:
+                users[user_id] = user_data
             else:
-                raise UserDoesNotExistsError
+                missing.append(user_id)
 
-        except FirebaseError:
-            raise DataDidNotLoadError
+        return users, missing
+
+    @instrumented
+    def read_users(self, user_ids: list[str]) -> dict[str, dict]:
+        """Read the data of the given users who exist with one batched read, without looking
+        in the cache first, cache it, and return it keyed by user ID
+
+        :param user_ids: the user IDs of the people, e.g. the friends of a user
+
+        Precondition:
+        - len(user_ids) <= constants.GET_USERS_CHUNK_SIZE
+        """
+        users = self.storage.get_users(user_ids)
+
+        for user_id, user_data in users.items():
+            self.cache.put(user_id, user_data)
+
+        return users
+
+    @instrumented
+    def get_preference_matches(self, user_id: str) -> list[tuple[float, str]]:
+        """Return the (similarity score, user) pairs of every user recommended to the given user
+        by Graph.recommend_friends, in the same order, without loading the graph
 
+        Only the users who share a preference with the user can have a non-zero score, so they
+        are found with one indexed query per preference of the user, and only their preferences
+        are read, in chunks of constants.GET_USERS_CHUNK_SIZE users, without being cached. This
+        is meant for offline jobs that do not keep a graph, since a popular preference makes it
+        read the preferences of most users.
+
+        :param user_id: The user ID of the person
+
+        Precondition:
+        - self.is_user(user_id)
+        """
+        user_data = self.get_user_data(user_id)
+        preferences = {(category, preference) for category in constants.CATEGORIES
+                       for preference in user_data.get(category, [])}
+
+        candidates = set()
+
+        for category, preference in preferences:
+            candidates.update(self.storage.get_user_ids_with_preference(category, preference))
+
+        candidates.difference_update([user_id, *user_data.get('friends', [])])
+
+        candidates = sorted(candidates)
+        chunk_size = constants.GET_USERS_CHUNK_SIZE
+        matches = []
+
+        for start in range(0, len(candidates), chunk_size):
+            others = self.storage.get_users(candidates[start:start + chunk_size],
+                                            list(constants.CATEGORIES))
+
+            for other, other_data in others.items():
+                other_preferences = {(category, preference) for category in constants.CATEGORIES
+                                     for preference in other_data.get(category, [])}
+                matches.append((len(preferences & other_preferences) /
+                                len(preferences | other_preferences), other))
+
+        return sorted(matches, reverse=True)
+
+    @instrumented
     def update_user_data(self, user_id: str, user_data: dict) -> bool:
         """ Update the data of a user
 
+        The time of the update is recorded in the 'updatedAt' field of the user.
+
         :param user_id: The user ID of the person
         :param user_data: the data of the user
         :return: whether the process was successful
         """
         if self.is_user(user_id):
             try:
-                self.db.collection(constants.COLLECTION).document(user_id).set(user_data,
-                                                                               merge=True)
-                return True
+                self.storage.set_user(user_id, user_data, merge=True)
             except (ValueError, TypeError):
                 return False
-            except FirebaseError:
-                raise DataDidNotLoadError
+
+            self.cache.merge(user_id, user_data, ['updatedAt'])
+
+            with self.graph_lock:
+                if self.graph is not None:
+                    self.graph.update_user(user_id, user_data)
+
+            return True
         return False
 
+    @instrumented
     def get_all_data(self) -> Optional[list[dict]]:
-        """Return all the users data in the firebase database
+        """Return all the users data in the database
+
+        Callers that can use the users one at a time, or only need some of their fields, should
+        use iter_all_data instead.
         """
-        data = []
+        return list(self.iter_all_data())
 
-        try:
-            entries = self.db.collection(constants.COLLECTION).get()
+    @instrumented
+    def iter_all_data(self, fields: Optional[list[str]] = None,
+                      page_size: int = constants.PAGE_SIZE) -> Iterator[dict]:
+        """Yield the data of all the users in the database, one page at a time
 
-            for entry in entries:
-                if entry.exists:
-                    data.append(entry.to_dict())
+        The users are read in order of user ID, in pages of <page_size> users, each page
+        starting after the last user of the previous one, so only one page is held in memory at
+        a time. Only the given fields of each user are read, e.g. ['userID'].
 
-        except FirebaseError:
-            raise DataDidNotLoadError
+        :param fields: the fields of the users to read, or None to read all of them
+        :param page_size: the number of users read at a time
+        """
+        yield from self.storage.iter_users(fields, page_size)
 
-        return data
+    @instrumented
+    def get_data_updated_since(self, timestamp: float) -> list[dict]:
+        """Return the data of the users who were registered or updated after <timestamp>
+
+        :param timestamp: a time in seconds since the epoch
+        """
+        return self.storage.get_users_updated_since(timestamp)
 
+    @instrumented
+    def get_user_ids_deleted_since(self, timestamp: float) -> list[str]:
+        """Return the user IDs of the users who were deleted after <timestamp>, some of whom
+        may have been registered again since
+
+        :param timestamp: a time in seconds since the epoch
+        """
+        return self.storage.get_user_ids_deleted_since(timestamp)
+
+    @instrumented
+    def get_all_user_ids(self) -> list[str]:
+        """Return the user IDs of all the users in the database, without reading their data
+        """
+        return self.storage.get_user_ids()
+
+    @instrumented
     def is_user(self, user_id: str) -> bool:
         """ Return whether the user in in the database
 
+        The user exists if the cache holds a fresh copy of their data. Otherwise their data is
+        read, and cached if they exist.
+
         :param user_id: The user ID of the person
         """
-        try:
-            user = self.db.collection(constants.COLLECTION).document(user_id).get()
+        if self.cache.get(user_id) is not None:
+            return True
 
-            if user.exists:
-                return True
-            else:
-                return False
+        try:
+            user_data = self.storage.get_user(user_id)
+        except DataDidNotLoadError:
+            return False
 
-        except FirebaseError:
+        if user_data is not None:
+            self.cache.put(user_id, user_data)
+            return True
+        else:
             return False
 
+    @instrumented
     def add_friend(self, of: str, to: str) -> None:
         """ Add friend to a user
 
+        Both users are changed in one atomic write, see _set_friendship.
+
         :param of: the user who is adding friend
         :param to: the user who is added friend
 
         Precondition:
         - <of> is a valid user id
         - <to> is a valid user id
+        - of != to
         """
-        of_data = self.get_user_data(of)
-        to_data = self.get_user_data(to)
-
-        if not (to in of_data['friends'] or of in to_data['friends']):
-            of_data['friends'].append(to)
-            to_data['friends'].append(of)
-
-            self.update_user_data(of, of_data)
-            self.update_user_data(to, to_data)
+        self._set_friendship(of, to, True)
 
+    @instrumented
     def un_friend(self, by: str, to: str) -> None:
         """remove friend
 
+        Both users are changed in one atomic write, see _set_friendship.
+
         :param by: Id of the user who is un friending
         :param to: Id of the user who is getting un friended
 
@@ -159,29 +437,91 @@ class DataHandler:
         - <by> is a valid user id
         - <to> is a valid user id
         """
-        by_data = self.get_user_data(by)
-        to_data = self.get_user_data(to)
+        self._set_friendship(by, to, False)
 
-        if to in by_data['friends'] and by in to_data['friends']:
-            by_data['friends'].remove(to)
-            to_data['friends'].remove(by)
+    def _set_friendship(self, user1: str, user2: str, friends: bool) -> None:
+        """ Make the two users friends, or not friends, in a single atomic write
 
-            self.update_user_data(by, by_data)
-            self.update_user_data(to, to_data)
+        Each user is added to (or removed from) the friends of the other without overwriting
+        friendships changed at the same time by other sessions. Adding an existing friendship or
+        removing a missing one changes nothing.
 
+        :param user1: Id of one of the users
+        :param user2: Id of the other user
+        :param friends: whether the users become friends
+
+        Precondition:
+        - <user1> is a valid user id
+        - <user2> is a valid user id
+        """
+        self.storage.set_friendship(user1, user2, friends)
+
+        # The new friends lists are only known to the database
+        self.cache.remove(user1)
+        self.cache.remove(user2)
+
+        with self.graph_lock:
+            if self.graph is not None:
+                try:
+                    if friends:
+                        self.graph.add_edge(user1, user2)
+                    else:
+                        self.graph.remove_edge(user1, user2)
+                except ValueError:
+                    # One of the users was registered by another session after the graph was
+                    # loaded
+                    pass
+
+    @instrumented
     def delete_user(self, user_id: str) -> None:
         """ Delete the user if it exists
 
+        The user is removed from the friends of their friends in atomic writes of up to
+        self.storage.batch_size documents, and the last write also deletes the user and records
+        the deletion, so a user with n friends is deleted in about n / self.storage.batch_size
+        round trips. Each write
+        removes both sides of the friendships it changes, so a deletion that fails halfway never
+        leaves a friendship on one side only, and can simply be done again.
+
+        The friends are read from the database rather than the cache, since a cached copy may
+        miss friends added by other sessions, whose friendships would then be left behind.
+
         :param user_id: Id of the user
         """
-        if self.is_user(user_id):
+        user_data = self.storage.get_user(user_id)
+
+        if user_data is not None:
+            friends = user_data.get('friends', [])
+
+            # Each write also updates or, for the last one, deletes the user and records the
+            # deletion
+            chunk_size = self.storage.batch_size - 2
+
+            try:
+                for start in range(0, max(len(friends), 1), chunk_size):
+                    chunk = friends[start:start + chunk_size]
 
-            user_data = self.get_user_data(user_id)
+                    self.storage.remove_friendships(user_id, chunk,
+                                                    start + chunk_size >= len(friends))
 
-            for friend in user_data['friends']:
-                self.un_friend(by=user_id, to=friend)
+                    for friend in chunk:
+                        self.cache.remove(friend)
 
-            self.db.collection(constants.COLLECTION).document(user_id).delete()
+                    with self.graph_lock:
+                        if self.graph is not None:
+                            for friend in chunk:
+                                try:
+                                    self.graph.remove_edge(user_id, friend)
+                                except ValueError:
+                                    # The friend no longer exists
+                                    pass
+
+            finally:
+                self.cache.remove(user_id)
+
+            with self.graph_lock:
+                if self.graph is not None:
+                    self.graph.remove_user(user_id)
 
     @staticmethod
     def extract_data_from_csv(filepath: str) -> list[dict]:
@@ -226,6 +566,7 @@ class DataHandler:
             'food': row[4].split(';')
         }
 
+    @instrumented
     def add_users_from_csv(self, filename: str) -> None:
         """register all the users in the csv file to our app
 
@@ -240,6 +581,153 @@ class DataHandler:
         for user in data:
             self.register(user['userID'], user)
 
+    @instrumented
+    def bulk_add_users_from_csv(self, filename: str,
+                                checkpoint: str = constants.IMPORT_CHECKPOINT,
+                                batch_size: int = constants.IMPORT_BATCH_SIZE,
+                                workers: int = constants.IMPORT_WORKERS) -> int:
+        """register all the users in the csv file to our app, many users at a time
+
+        The rows are imported in chunks of <batch_size>: the users of a chunk that already exist
+        are found with one batched read, and the others are registered with one batched write.
+        Up to <workers> chunks are imported at the same time, the next chunk being submitted as
+        one of them completes, and the throughput is printed as the chunks complete. Like
+        add_users_from_csv, only the first row of a user ID is used.
+
+        The number of rows imported is saved in the <checkpoint> file, so that an import that was
+        interrupted resumes where it stopped when it is run again on the same file. Rows are
+        only counted once every row before them is imported, so a few rows may be imported again
+        after a crash, which is harmless since existing users are skipped. The checkpoint file
+        is removed once every row is imported.
+
+        :param filename: name of the file containing the data
+        :param checkpoint: name of the file the progress of the import is saved in
+        :param batch_size: the number of users read and written at a time
+        :param workers: the maximum number of chunks imported at the same time
+        :return: the number of users registered
+
+        Precondition:
+        - filename is a valid path to the dataset
+        - 1 <= batch_size <= self.storage.batch_size
+        - workers >= 1
+        """
+        data = DataHandler.extract_data_from_csv(filename)
+        first_rows = {}
+
+        for row, user_data in enumerate(data):
+            first_rows.setdefault(user_data['userID'], row)
+
+        start = DataHandler._read_checkpoint(checkpoint, filename)
+        chunks = ((first, min(first + batch_size, len(data)))
+                  for first in range(start, len(data), batch_size))
+
+        # Maps the first row of each imported chunk to the row after its last, until every
+        # chunk before it is imported too
+        finished = {}
+        imported = start
+        rows = registered = 0
+        start_time = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+
+            while True:
+                # Only submit a chunk once a thread is free to import it, so that a failure
+                # leaves few chunks to cancel
+                for first, last in islice(chunks, workers - len(futures)):
+                    users = [data[row] for row in range(first, last)
+                             if first_rows[data[row]['userID']] == row]
+                    futures[executor.submit(self._register_batch, users)] = (first, last)
+
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    first, last = futures.pop(future)
+
+                    if future.exception() is not None:
+                        # Stop at the first failure, so that the checkpoint is close to it
+                        for other in futures:
+                            other.cancel()
+
+                        raise future.exception()
+
+                    with self.graph_lock:
+                        for user_data in future.result():
+                            if self.graph is not None:
+                                self.graph.add_user(user_data)
+
+                            registered += 1
+
+                    finished[first] = last
+
+                    while imported in finished:
+                        imported = finished.pop(imported)
+
+                    DataHandler._write_checkpoint(checkpoint, filename, imported)
+
+                    rows += last - first
+                    rate = rows / (time.perf_counter() - start_time)
+
+                    print(f'Imported {start + rows}/{len(data)} rows ({rate:.0f} rows/s), '
+                          f'registered {registered} users')
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        return registered
+
+    @instrumented
+    def _register_batch(self, users: list[dict]) -> list[dict]:
+        """Register the given users who do not exist yet, with one batched read and one batched
+        write, and return their data as stored in the database (except 'updatedAt')
+
+        :param users: the data of the users, with distinct user IDs
+
+        Precondition:
+        - len(users) <= self.storage.batch_size
+        """
+        try:
+            existing = self.storage.get_users([user_data['userID'] for user_data in users],
+                                              ['userID'])
+
+            new_users = [{**user_data, 'friends': []} for user_data in users
+                         if user_data['userID'] not in existing]
+
+            if new_users:
+                self.storage.add_users(new_users)
+
+        except (ValueError, TypeError):
+            raise DataDidNotLoadError
+
+        return new_users
+
+    @staticmethod
+    def _read_checkpoint(checkpoint: str, filename: str) -> int:
+        """Return the number of rows of <filename> imported according to the <checkpoint> file,
+        or 0 if there is no checkpoint of an import of <filename>
+        """
+        try:
+            with open(checkpoint) as file:
+                progress = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+        return progress['rows'] if progress.get('filename') == filename else 0
+
+    @staticmethod
+    def _write_checkpoint(checkpoint: str, filename: str, rows: int) -> None:
+        """Save in the <checkpoint> file that the first <rows> rows of <filename> are imported
+
+        The file is replaced at once, so that a crash never leaves a partly written checkpoint.
+        """
+        with open(checkpoint + '.tmp', 'w') as file:
+            json.dump({'filename': filename, 'rows': rows}, file)
+
+        os.replace(checkpoint + '.tmp', checkpoint)
+
 
 if __name__ == '__main__':
     # The code below is used to register all the people from the survey we conducted:
@@ -248,16 +736,32 @@ if __name__ == '__main__':
     #     data_handler = DataHandler()
     #     data_handler.add_users_from_csv(Constants.DATA)
 
+    # A large export of users is registered many users at a time with:
+
+    #     data_handler.bulk_add_users_from_csv(filename)
+
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['csv',
+        'extra-imports': ['atexit',
+                          'csv',
+                          'json',
+                          'os',
+                          'threading',
+                          'time',
+                          'concurrent.futures',
+                          'itertools',
                           'typing',
-                          'firebase_admin',
-                          'firebase_admin.exceptions',
                           'custom_exceptions',
+                          'instrumentation',
+                          'change_feed',
+                          'sqlite_storage',
+                          'storage',
+                          'firestore_storage',
+                          'user_cache',
                           'constants'],
-        'allowed-io': ['extract_data_from_csv'],
+        'allowed-io': ['extract_data_from_csv', 'bulk_add_users_from_csv', '_read_checkpoint',
+                       '_write_checkpoint'],
         'max-line-length': 100,
         'disable': ['E1136']
     })
@@ -0,0 +1,82 @@
+"""File contains the batch job that computes the friend recommendations of every user
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import json
+import multiprocessing
+
+from compact_graph import CompactGraph
+import constants
+
+# The graph of a worker process, memory-mapped from the snapshot once per process
+_graph: Optional[CompactGraph] = None
+
+
+def score_all_users(snapshot_path: str, output_path: str,
+                    limit: int = constants.RECOMMENDATION_TABLE_LIMIT,
+                    processes: Optional[int] = None) -> int:
+    """Compute the top <limit> recommendations of every user in the graph snapshot at
+    <snapshot_path>, and write them to <output_path>. Return the number of users scored.
+
+    The users are split into shards scored by a pool of <processes> worker processes (one per
+    core if None). Every worker memory-maps the snapshot instead of being sent a copy of the
+    graph, so all the workers share the same pages of memory.
+
+    The output file has one line per user, in sorted order of user id, each a JSON object
+    {"userID": ..., "matches": [[score, user], ...]} with the matches in descending order.
+
+    Preconditions:
+        - limit >= 1
+        - processes is None or processes >= 1
+    """
+    num_users = CompactGraph.load_snapshot(snapshot_path).get_user_count()
+    processes = processes or multiprocessing.cpu_count()
+
+    # More shards than workers, so that a worker with an easy shard picks up another one
+    shard_size = max(1, -(-num_users // (processes * constants.SHARDS_PER_PROCESS)))
+    shards = [(start, min(start + shard_size, num_users), limit)
+              for start in range(0, num_users, shard_size)]
+
+    with multiprocessing.Pool(processes, _load_graph, (snapshot_path,)) as pool, \
+            open(output_path, 'w') as file:
+        for lines in pool.imap(_score_shard, shards):
+            file.writelines(lines)
+
+    return num_users
+
+
+def _load_graph(snapshot_path: str) -> None:
+    """Memory-map the graph snapshot at <snapshot_path> in this worker process."""
+    global _graph
+    _graph = CompactGraph.load_snapshot(snapshot_path)
+
+
+def _score_shard(shard: tuple[int, int, int]) -> list[str]:
+    """Return the output lines of the users start to end - 1 of the shard (start, end, limit)."""
+    start, end, limit = shard
+
+    return [json.dumps({'userID': user, 'matches': _graph.get_top_matches(user, limit)}) + '\n'
+            for user in _graph.get_user_range(start, end)]
+
+
+if __name__ == '__main__':
+    # The code below scores every user from the latest snapshot (see compact_graph.py):
+
+    #     score_all_users(constants.GRAPH_SNAPSHOT, 'data/recommendations.jsonl')
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing',
+                          'json',
+                          'multiprocessing',
+                          'compact_graph',
+                          'constants'],
+        'allowed-io': ['score_all_users'],
+        'max-line-length': 100,
+        'disable': ['E1136', 'W0603']
+    })
@@ -0,0 +1,13 @@
+"""The benchmarks package contains the tools used to measure how the app behaves with many more
+users than the survey we conducted:
+
+    - generator: creates synthetic users whose preferences follow the survey answers
+    - local_handler: a stand-in for DataHandler that keeps the users in memory
+    - run: times the graph and search operations and writes the results as JSON
+
+The benchmarks are run from the root of the project, e.g.
+
+    $ python3 -m benchmarks.run --sizes 10000 100000 --output results.json
+
+By Eeshan Narula and Avnish Pasari
+"""
@@ -0,0 +1,147 @@
+"""File contains the generator of synthetic users, whose preferences are sampled from the answers
+to the survey we conducted
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from random import Random
+from typing import Optional
+
+from authenticate import DataHandler
+import constants
+
+# The distributions the number of friends of a user can be drawn from
+DEGREE_DISTRIBUTIONS = ('constant', 'poisson', 'power-law')
+
+# The exponent of the power-law distribution of the number of friends
+_POWER_LAW_EXPONENT = 2.5
+
+
+class SurveyDistribution:
+    """The distribution of the preferences of the users who answered the survey.
+
+    The preferences of a synthetic user are sampled one category at a time: in each category,
+    the user likes exactly the preferences one of the survey users chose in that category. This
+    keeps the popularity of every preference and the preferences usually chosen together, while
+    the categories of different survey users are mixed to give far more distinct users.
+
+    Instance Attributes:
+        - answers: maps each category to the preferences chosen by each survey user in it
+
+    Representation Invariants:
+        - all(self.answers[category] != [] for category in constants.CATEGORIES)
+    """
+    answers: dict[str, list[list[str]]]
+
+    def __init__(self, filepath: str = constants.DATA) -> None:
+        """Initialize the distribution of the survey answers in the csv file at <filepath>.
+
+        Preconditions:
+            - filepath is a valid path to the dataset
+        """
+        rows = DataHandler.extract_data_from_csv(filepath)
+
+        self.answers = {category: [row[category] for row in rows]
+                        for category in constants.CATEGORIES}
+
+    def sample_preferences(self, random: Random) -> dict[str, list[str]]:
+        """Return the preferences of a new synthetic user, keyed by category."""
+        return {category: list(random.choice(self.answers[category]))
+                for category in constants.CATEGORIES}
+
+
+def sample_degree(distribution: str, mean_degree: float, random: Random) -> int:
+    """Return a number of friends drawn from the given distribution, with the given mean.
+
+    'constant' always returns round(mean_degree), 'poisson' gives everyone about the same number
+    of friends, and 'power-law' gives most users a few friends and a few users very many, as in
+    real social networks.
+
+    Preconditions:
+        - distribution in DEGREE_DISTRIBUTIONS
+        - mean_degree >= 0
+    """
+    if distribution == 'constant':
+        return round(mean_degree)
+    elif distribution == 'poisson':
+        # The number of arrivals of a Poisson process with rate 1 before time mean_degree
+        degree = 0
+        time = random.expovariate(1)
+
+        while time < mean_degree:
+            degree += 1
+            time += random.expovariate(1)
+
+        return degree
+    else:
+        # A Pareto variable with this exponent has mean exponent / (exponent - 1)
+        scale = mean_degree * (_POWER_LAW_EXPONENT - 1) / _POWER_LAW_EXPONENT
+
+        return round(scale * random.paretovariate(_POWER_LAW_EXPONENT))
+
+
+def generate_users(num_users: int, mean_degree: float = 10,
+                   distribution: str = 'power-law', seed: int = 0,
+                   survey: Optional[SurveyDistribution] = None) -> list[dict]:
+    """Return the data of <num_users> synthetic users, in the format stored in the firebase
+    database.
+
+    The preferences of the users are sampled from <survey> (the survey in constants.DATA if
+    None). Every user is given a number of friends drawn from <distribution>, and friends are
+    paired at random between users (the configuration model): a pair that would make a user
+    their own friend, or friends twice, is dropped, so the degrees are slightly lower than
+    drawn. The same seed always gives the same users.
+
+    Preconditions:
+        - num_users >= 1
+        - mean_degree >= 0
+        - distribution in DEGREE_DISTRIBUTIONS
+    """
+    random = Random(seed)
+
+    if survey is None:
+        survey = SurveyDistribution()
+
+    users = []
+
+    for i in range(num_users):
+        user = {'userID': f'user{i:07d}', 'friends': []}
+        user.update(survey.sample_preferences(random))
+        users.append(user)
+
+    # Each user appears once in stubs for every friend they should have
+    stubs = []
+
+    for i in range(num_users):
+        stubs.extend([i] * min(sample_degree(distribution, mean_degree, random), num_users - 1))
+
+    random.shuffle(stubs)
+
+    friends = [set() for _ in range(num_users)]
+
+    for k in range(0, len(stubs) - 1, 2):
+        i, j = stubs[k], stubs[k + 1]
+
+        if i != j and j not in friends[i]:
+            friends[i].add(j)
+            friends[j].add(i)
+
+    for i in range(num_users):
+        users[i]['friends'] = [users[j]['userID'] for j in sorted(friends[i])]
+
+    return users
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['random',
+                          'typing',
+                          'authenticate',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
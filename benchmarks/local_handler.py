@@ -0,0 +1,142 @@
+"""File contains the LocalDataHandler class, a stand-in for DataHandler that keeps the users in
+memory instead of the firebase database
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from typing import Any, Iterator, Optional
+
+import time
+
+from custom_exceptions import UserDoesNotExistsError
+import constants
+
+
+class LocalDataHandler:
+    """A handler serving the data of users kept in memory, with the methods of DataHandler used
+    to load and search the users, so that they can be timed without a firebase server.
+
+    Like the firebase client, every read returns new copies of the stored data, so that the cost
+    of building the returned dictionaries is included in the timings. The reads of one user or
+    of a chunk of users also wait for <latency> seconds, to simulate a round trip to the
+    database, and no user is cached.
+
+    Instance Attributes:
+        - graph: the friend recommendation graph kept up to date for this handler, or None
+        - latency: the number of seconds each read of one user or of a chunk of users waits for
+    """
+    graph: Optional[Any]
+    latency: float
+
+    # Private Instance Attributes:
+    #     - _users:
+    #         Maps the user ID of each user to their data.
+    _users: dict[str, dict]
+
+    def __init__(self, users: list[dict], latency: float = 0.0) -> None:
+        """Initialize a handler serving the given user data.
+
+        :param users: the data of the users, in the format stored in the firebase database
+        :param latency: the number of seconds each read of one user or of a chunk of users
+        waits for
+
+        Preconditions:
+            - latency >= 0
+        """
+        self._users = {user['userID']: user for user in users}
+        self.graph = None
+        self.latency = latency
+
+    def get_user_data(self, user_id: str) -> dict:
+        """Return data for a user as a dictionary
+
+        :param user_id: The user ID of the person
+        """
+        time.sleep(self.latency)
+
+        if user_id in self._users:
+            return LocalDataHandler._copy(self._users[user_id])
+        else:
+            raise UserDoesNotExistsError
+
+    def get_users(self, user_ids: list[str]) -> dict[str, dict]:
+        """Return the data of the given users who exist, keyed by user ID, read in chunks of
+        constants.GET_USERS_CHUNK_SIZE users like DataHandler.get_users
+
+        :param user_ids: the user IDs of the people, e.g. the friends of a user
+        """
+        users, missing = self.get_cached_users(user_ids)
+
+        for start in range(0, len(missing), constants.GET_USERS_CHUNK_SIZE):
+            users.update(self.read_users(missing[start:start + constants.GET_USERS_CHUNK_SIZE]))
+
+        return users
+
+    def get_cached_users(self, user_ids: list[str]) -> tuple[dict[str, dict], list[str]]:
+        """Return no cached users, and the given user IDs without repeating any of them, since
+        this handler has no cache
+
+        :param user_ids: the user IDs of the people
+        """
+        return {}, list(dict.fromkeys(user_ids))
+
+    def read_users(self, user_ids: list[str]) -> dict[str, dict]:
+        """Return the data of the given users who exist, keyed by user ID, read together
+
+        :param user_ids: the user IDs of the people, e.g. the friends of a user
+        """
+        time.sleep(self.latency)
+
+        return {user_id: LocalDataHandler._copy(self._users[user_id])
+                for user_id in user_ids if user_id in self._users}
+
+    def get_all_data(self) -> list[dict]:
+        """Return all the users data"""
+        return [LocalDataHandler._copy(user) for user in self._users.values()]
+
+    def iter_all_data(self, fields: Optional[list[str]] = None,
+                      page_size: int = constants.PAGE_SIZE) -> Iterator[dict]:
+        """Yield the given fields of the data of all the users, in order of user ID
+
+        :param fields: the fields of the users to return, or None to return all of them
+        :param page_size: unused, since there are no pages to read
+        """
+        for user_id in sorted(self._users):
+            user = LocalDataHandler._copy(self._users[user_id])
+
+            if fields is None:
+                yield user
+            else:
+                yield {field: user[field] for field in fields if field in user}
+
+    def get_all_user_ids(self) -> list[str]:
+        """Return the user IDs of all the users"""
+        return list(self._users)
+
+    def is_user(self, user_id: str) -> bool:
+        """Return whether the given user exists
+
+        :param user_id: The user ID of the person
+        """
+        return user_id in self._users
+
+    @staticmethod
+    def _copy(user: dict) -> dict:
+        """Return a copy of the data of a user, with copies of its lists."""
+        return {key: list(value) if isinstance(value, list) else value
+                for key, value in user.items()}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing',
+                          'time',
+                          'custom_exceptions',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -0,0 +1,244 @@
+"""File contains the benchmarks of loading the friend recommendation graph, recommending friends,
+viewing a network and searching for people, on synthetic users, and of reading the friends of a
+user from a database with a simulated latency
+
+Run them from the root of the project, e.g.
+
+    $ python3 -m benchmarks.run --sizes 10000 100000 1000000 --output results.json
+
+The results are written as JSON, so that the results of two runs can be compared.
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from random import Random
+from typing import Any, Callable
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import time
+
+from async_authenticate import AsyncDataHandler
+from recommendation_graph import Graph, PreferenceMatrix
+from screen import SearchPeople
+import constants
+
+from benchmarks.generator import DEGREE_DISTRIBUTIONS, SurveyDistribution, generate_users
+from benchmarks.local_handler import LocalDataHandler
+
+
+def time_call(function: Callable, *args: Any) -> tuple[float, Any]:
+    """Return the number of seconds function(*args) took, and its return value."""
+    start = time.perf_counter()
+    value = function(*args)
+
+    return time.perf_counter() - start, value
+
+
+def summarize(seconds: list[float]) -> dict[str, float]:
+    """Return the statistics reported for the timings of the calls of one operation.
+
+    Preconditions:
+        - seconds != []
+    """
+    ordered = sorted(seconds)
+
+    return {'calls': len(ordered),
+            'total_seconds': sum(ordered),
+            'mean_seconds': statistics.mean(ordered),
+            'median_seconds': statistics.median(ordered),
+            'p95_seconds': ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+            'min_seconds': ordered[0],
+            'max_seconds': ordered[-1]}
+
+
+def benchmark_size(num_users: int, mean_degree: float, distribution: str, samples: int,
+                   search_samples: int, seed: int, survey: SurveyDistribution) -> dict:
+    """Return the timings of the benchmarks on <num_users> synthetic users.
+
+    Every operation on a single user is timed for the same <samples> users drawn at random, so
+    that none of them is served from the recommendation cache. SearchPeople.search, which looks
+    at every user, is timed for <search_samples> queries.
+
+    Preconditions:
+        - num_users >= 1
+        - 1 <= samples <= num_users
+        - search_samples >= 1
+    """
+    random = Random(seed)
+
+    generate_seconds, users = time_call(generate_users, num_users, mean_degree, distribution,
+                                        seed, survey)
+    handler = LocalDataHandler(users)
+    user_ids = [user['userID'] for user in users]
+    sample = random.sample(user_ids, samples)
+
+    timings = {}
+
+    load_seconds, graph = time_call(Graph.load_friends_graph, handler)
+    timings['load_friends_graph'] = summarize([load_seconds])
+
+    engines = ['python'] if PreferenceMatrix is None else ['python', 'numpy']
+
+    for engine in engines:
+        seconds = []
+
+        for user in sample:
+            seconds.append(time_call(graph.recommend_friends, user,
+                                     constants.RECOMMENDATIONS_PER_PAGE, 0, engine)[0])
+
+        # The first call of the 'numpy' engine also builds the user x preference matrix
+        timings[f'recommend_friends[{engine}]'] = summarize(seconds)
+
+    network_seconds = []
+    format_seconds = []
+
+    for user in sample:
+        seconds, network = time_call(graph.generate_users_graph_for_user, user, constants.DEPTH,
+                                     constants.MAX_NETWORK_VERTICES)
+        network_seconds.append(seconds)
+        format_seconds.append(time_call(network.format_for_graph, constants.MAX_PLOT_ELEMENTS,
+                                        user)[0])
+
+    timings['generate_users_graph_for_user'] = summarize(network_seconds)
+    timings['format_for_graph'] = summarize(format_seconds)
+
+    search = SearchPeople(handler)
+    search_seconds = []
+
+    for user in random.sample(sample, min(search_samples, samples)):
+        query = user[:random.randint(1, len(user))]
+        search_seconds.append(time_call(search.search, user_ids, query, 10)[0])
+
+    timings['SearchPeople.search'] = summarize(search_seconds)
+
+    return {'users': num_users,
+            'friendships': sum(len(user['friends']) for user in users) // 2,
+            'generate_seconds': generate_seconds,
+            'timings': timings}
+
+
+def benchmark_friend_reads(num_friends: int, latency: float, samples: int, seed: int,
+                           survey: SurveyDistribution) -> dict:
+    """Return the timings of reading the data of the <num_friends> friends of a user, from a
+    database where each read of one user or of a chunk of users takes <latency> seconds.
+
+    The friends are read one at a time with get_user_data, in chunks one after the other with
+    get_users, and in chunks all at the same time with AsyncDataHandler.get_users, each
+    <samples> times.
+
+    Preconditions:
+        - num_friends >= 1
+        - latency >= 0
+        - samples >= 1
+    """
+    friends = generate_users(num_friends, 0, seed=seed, survey=survey)
+    friend_ids = [friend['userID'] for friend in friends]
+
+    handler = LocalDataHandler(friends, latency)
+    timings = {}
+
+    timings['get_user_data[each friend]'] = summarize(
+        [time_call(lambda: [handler.get_user_data(friend) for friend in friend_ids])[0]
+         for _ in range(samples)])
+
+    timings['get_users'] = summarize([time_call(handler.get_users, friend_ids)[0]
+                                      for _ in range(samples)])
+
+    async_handler = AsyncDataHandler(handler)
+
+    # Each call runs its own event loop, on the threads of the same handler
+    timings['AsyncDataHandler.get_users'] = summarize(
+        [time_call(asyncio.run, async_handler.get_users(friend_ids))[0] for _ in range(samples)])
+
+    async_handler.close()
+
+    return {'friends': num_friends,
+            'latency_seconds': latency,
+            'chunk_size': constants.GET_USERS_CHUNK_SIZE,
+            'timings': timings}
+
+
+def run_benchmarks(sizes: list[int], mean_degree: float = 10, distribution: str = 'power-law',
+                   samples: int = 100, search_samples: int = 3, seed: int = 0,
+                   friends: int = 200, latency: float = 0.01, read_samples: int = 3) -> dict:
+    """Return the results of the benchmarks on each number of users in <sizes>, and of reading
+    the data of <friends> friends with <latency> seconds per read, <read_samples> times.
+
+    The returned dictionary records the parameters of the run and the environment it ran in, so
+    that two runs can be compared.
+
+    Preconditions:
+        - all(size >= 1 for size in sizes)
+        - mean_degree >= 0
+        - distribution in DEGREE_DISTRIBUTIONS
+        - samples >= 1
+        - search_samples >= 1
+        - friends >= 1
+        - latency >= 0
+        - read_samples >= 1
+    """
+    survey = SurveyDistribution()
+
+    return {'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': PreferenceMatrix is not None,
+            'parameters': {'sizes': sizes,
+                           'mean_degree': mean_degree,
+                           'distribution': distribution,
+                           'samples': samples,
+                           'search_samples': search_samples,
+                           'seed': seed,
+                           'friends': friends,
+                           'latency': latency,
+                           'read_samples': read_samples},
+            'results': [benchmark_size(size, mean_degree, distribution, min(samples, size),
+                                       search_samples, seed, survey)
+                        for size in sizes],
+            'friend_reads': benchmark_friend_reads(friends, latency, read_samples, seed, survey)}
+
+
+def main() -> None:
+    """Run the benchmarks with the parameters given on the command line, and write the results
+    to the output file, or print them if there is none.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark Friendify on synthetic users.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='the numbers of users to benchmark on')
+    parser.add_argument('--mean-degree', type=float, default=10,
+                        help='the average number of friends of a user')
+    parser.add_argument('--distribution', choices=DEGREE_DISTRIBUTIONS, default='power-law',
+                        help='the distribution of the number of friends of a user')
+    parser.add_argument('--samples', type=int, default=100,
+                        help='the number of users each operation on one user is timed for')
+    parser.add_argument('--search-samples', type=int, default=3,
+                        help='the number of search queries timed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--friends', type=int, default=200,
+                        help='the number of friends whose data is read')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='the simulated number of seconds of a read from the database')
+    parser.add_argument('--read-samples', type=int, default=3,
+                        help='the number of times the friends are read with each method')
+    parser.add_argument('--output', help='the JSON file the results are written to')
+
+    arguments = parser.parse_args()
+
+    results = run_benchmarks(arguments.sizes, arguments.mean_degree, arguments.distribution,
+                             arguments.samples, arguments.search_samples, arguments.seed,
+                             arguments.friends, arguments.latency, arguments.read_samples)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""File contains the ChangeFeed class, used by DataHandler to keep the data it holds in memory up
+to date with the changes of the users made by other sessions, without reading all the users again
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import logging
+import threading
+import time
+
+from storage import DocumentChange, StorageBackend
+import constants
+
+
+class ChangeFeed:
+    """A listener of the changes of the users stored in a backend, which delivers them to its
+    consumers in batches on a background thread.
+
+    The changes that arrive within <batch_delay> seconds of the first undelivered one are
+    delivered together, up to <max_batch> users at a time, so that a burst of changes is applied
+    in a few calls instead of one call per change. The changes of a user that are not delivered
+    yet are coalesced into the last one, so that each consumer sees at most one change per user
+    in a batch; a user added and then modified is still reported as 'added'.
+
+    The consumers are called on the thread of the feed, one batch at a time, in the order they
+    were added, and should treat 'added' and 'modified' the same way, since the first batches
+    report every existing user as 'added'. A consumer that raises an error has missed the
+    changes of that batch: the error is logged, and the consumer is resynced if it was added with
+    a resync function, or flagged as failed otherwise.
+
+    Instance Attributes:
+        - batch_delay: the number of seconds a change waits for others to be delivered with
+        - max_batch: the maximum number of changes delivered together
+        - received: the number of changes received from the backend
+        - coalesced: the number of changes replaced by a later change of the same user
+        - delivered: the number of changes delivered to the consumers
+        - batches: the number of batches delivered
+        - errors: the number of calls of a consumer that raised an error
+        - failed: the consumers that missed the changes of a batch and were not resynced
+        - last_lag: the number of seconds between the oldest change of the last batch and its
+          delivery
+        - max_lag: the largest last_lag so far
+
+    Representation Invariants:
+        - self.batch_delay >= 0
+        - self.max_batch >= 1
+    """
+    batch_delay: float
+    max_batch: int
+    received: int
+    coalesced: int
+    delivered: int
+    batches: int
+    errors: int
+    failed: list[Callable[[list[DocumentChange]], None]]
+    last_lag: float
+    max_lag: float
+
+    # Private Instance Attributes:
+    #     - _storage:
+    #         The backend the changes are listened to.
+    #     - _consumers:
+    #         The functions the batches of changes are delivered to, each with the function
+    #         resyncing it after it failed, or None.
+    #     - _pending:
+    #         Maps the user ID of each user with undelivered changes to the time of their
+    #         oldest undelivered change and their last change, from the least to the most
+    #         recently changed.
+    #     - _pending_since:
+    #         The time.monotonic() time the oldest undelivered batch started waiting.
+    #     - _condition:
+    #         The condition guarding the undelivered changes, notified when they change.
+    #     - _thread:
+    #         The thread delivering the changes, or None if the feed is not running.
+    #     - _unsubscribe:
+    #         The function that stops the backend listener, or None if the feed is not running.
+    #     - _running:
+    #         Whether the feed is running.
+    _storage: StorageBackend
+    _consumers: list[tuple[Callable[[list[DocumentChange]], None],
+                           Optional[Callable[[], None]]]]
+    _pending: OrderedDict[str, tuple[float, DocumentChange]]
+    _pending_since: float
+    _condition: threading.Condition
+    _thread: Optional[threading.Thread]
+    _unsubscribe: Optional[Callable[[], None]]
+    _running: bool
+
+    def __init__(self, storage: StorageBackend,
+                 batch_delay: float = constants.CHANGE_FEED_BATCH_DELAY,
+                 max_batch: int = constants.CHANGE_FEED_MAX_BATCH) -> None:
+        """Initialize a feed of the changes of the users stored in <storage>, which is not
+        listening until it is started.
+
+        Preconditions:
+            - batch_delay >= 0
+            - max_batch >= 1
+        """
+        self.batch_delay = batch_delay
+        self.max_batch = max_batch
+        self.received = 0
+        self.coalesced = 0
+        self.delivered = 0
+        self.batches = 0
+        self.errors = 0
+        self.failed = []
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+        self._storage = storage
+        self._consumers = []
+        self._pending = OrderedDict()
+        self._pending_since = 0.0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._unsubscribe = None
+        self._running = False
+
+    def add_consumer(self, consumer: Callable[[list[DocumentChange]], None],
+                     resync: Optional[Callable[[], None]] = None) -> None:
+        """Deliver the next batches of changes to <consumer> too.
+
+        If <consumer> raises an error, <resync> is called to bring the data it keeps up to date
+        with the database again, since it missed the changes of that batch.
+        """
+        with self._condition:
+            self._consumers.append((consumer, resync))
+
+    def remove_consumer(self, consumer: Callable[[list[DocumentChange]], None]) -> None:
+        """Stop delivering the batches of changes to <consumer>, if it was added."""
+        with self._condition:
+            self._consumers = [(other, resync) for other, resync in self._consumers
+                               if other != consumer]
+
+    def is_running(self) -> bool:
+        """Return whether the feed is listening to the changes of the users."""
+        return self._running
+
+    def start(self) -> None:
+        """Start listening to the changes of the users and delivering them. Do nothing if the
+        feed is already running.
+        """
+        if not self._running:
+            # The changes reported before the thread starts wait in the queue
+            self._unsubscribe = self._storage.listen(self._receive)
+
+            self._running = True
+            self._thread = threading.Thread(target=self._deliver_batches, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop listening to the changes of the users, after delivering the changes already
+        received. Do nothing if the feed is not running.
+
+        Preconditions:
+            - this method is not called by a consumer
+        """
+        if self._running:
+            self._unsubscribe()
+
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
+
+            self._thread.join()
+
+            self._thread = None
+            self._unsubscribe = None
+
+    def get_lag(self) -> float:
+        """Return the number of seconds since the oldest change that is not delivered yet was
+        read from the database, or 0 if every change received is delivered.
+        """
+        with self._condition:
+            if not self._pending:
+                return 0.0
+
+            oldest = min(timestamp for timestamp, _ in self._pending.values())
+
+        return max(0.0, time.time() - oldest)
+
+    def get_stats(self) -> dict[str, float]:
+        """Return the counters of this feed, its current and past lags, and the number of
+        changes that are not delivered yet.
+        """
+        with self._condition:
+            pending = len(self._pending)
+
+        return {'received': self.received,
+                'coalesced': self.coalesced,
+                'delivered': self.delivered,
+                'batches': self.batches,
+                'errors': self.errors,
+                'failed': len(self.failed),
+                'pending': pending,
+                'lag': self.get_lag(),
+                'last_lag': self.last_lag,
+                'max_lag': self.max_lag}
+
+    def _receive(self, changes: list[DocumentChange]) -> None:
+        """Queue the changes reported by the backend, coalescing them with the undelivered
+        changes of the same users.
+        """
+        with self._condition:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+
+            for change in changes:
+                self.received += 1
+
+                if change.user_id in self._pending:
+                    timestamp, previous = self._pending.pop(change.user_id)
+                    self.coalesced += 1
+
+                    if previous.kind == 'added' and change.kind == 'modified':
+                        change = DocumentChange('added', change.user_id, change.user_data,
+                                                change.timestamp)
+                else:
+                    timestamp = change.timestamp
+
+                self._pending[change.user_id] = (timestamp, change)
+
+            self._condition.notify_all()
+
+    def _deliver_batches(self) -> None:
+        """Deliver the queued changes to the consumers in batches until the feed is stopped and
+        every change received is delivered.
+        """
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+
+                if not self._pending:
+                    return
+
+                deadline = self._pending_since + self.batch_delay
+
+                while self._running and len(self._pending) < self.max_batch \
+                        and time.monotonic() < deadline:
+                    self._condition.wait(deadline - time.monotonic())
+
+                batch = [self._pending.popitem(last=False)[1]
+                         for _ in range(min(self.max_batch, len(self._pending)))]
+                consumers = list(self._consumers)
+
+                # The rest of the changes wait for the next batch from now on
+                self._pending_since = time.monotonic()
+
+            self._deliver(batch, consumers)
+
+    def _deliver(self, batch: list[tuple[float, DocumentChange]],
+                 consumers: list[tuple[Callable[[list[DocumentChange]], None],
+                                       Optional[Callable[[], None]]]]) -> None:
+        """Deliver a batch of changes, with the times of their oldest coalesced changes, to
+        the given consumers, and record its lag.
+
+        A consumer that raises an error is logged, counted and resynced or flagged, and still
+        gets the next batches.
+        """
+        changes = [change for _, change in batch]
+
+        for consumer, resync in consumers:
+            try:
+                consumer(changes)
+            # Any error of a consumer must not stop the delivery to the others
+            except Exception:  # pylint: disable=broad-except
+                logging.exception('A consumer of the change feed failed to apply %d changes',
+                                  len(changes))
+                self.errors += 1
+                self._resync(consumer, resync)
+
+        self.delivered += len(changes)
+        self.batches += 1
+        self.last_lag = max(0.0, time.time() - min(timestamp for timestamp, _ in batch))
+        self.max_lag = max(self.max_lag, self.last_lag)
+
+    def _resync(self, consumer: Callable[[list[DocumentChange]], None],
+                resync: Optional[Callable[[], None]]) -> None:
+        """Resync <consumer> with <resync> after it missed a batch of changes, or flag it as
+        failed if it cannot be resynced.
+        """
+        if resync is not None:
+            try:
+                resync()
+                return
+            # A failed resync leaves the consumer flagged instead of stopping the feed
+            except Exception:  # pylint: disable=broad-except
+                logging.exception('A consumer of the change feed failed to resync')
+
+        if consumer not in self.failed:
+            self.failed.append(consumer)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['collections',
+                          'typing',
+                          'logging',
+                          'threading',
+                          'time',
+                          'storage',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
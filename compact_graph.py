@@ -0,0 +1,665 @@
+"""File contains the CompactGraph class, a memory efficient friend recommendation graph
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional, Sequence
+from array import array
+from bisect import bisect_left
+
+import heapq
+import mmap
+import struct
+import sys
+
+from authenticate import DataHandler
+from recommendation_graph import Graph, count_bits, format_match, format_mutual_friends
+import constants
+
+# The number of preference bits stored in one word of a preference bitmask
+_WORD = 64
+
+# The header of a snapshot file: magic bytes, format version, byte order (1 for little endian),
+# snapshot time, then the number of users, bytes of user ids, preferences, bytes of preferences,
+# words per bitmask, friend indices and preference indices.
+_SNAPSHOT_HEADER = struct.Struct('<8sIId7Q')
+_SNAPSHOT_MAGIC = b'FRNDSNAP'
+_SNAPSHOT_VERSION = 1
+
+
+class _StringTable:
+    """A read-only sequence of strings stored in a buffer, used to share user ids between
+    processes without building a Python string for each of them up front.
+
+    String i is the utf-8 bytes data[offsets[i]:offsets[i + 1]].
+    """
+    # Private Instance Attributes:
+    #     - _offsets: the offsets of the strings in _data, followed by the length of _data
+    #     - _data: the utf-8 encoded strings, one after another
+    _offsets: Sequence[int]
+    _data: memoryview
+
+    def __init__(self, offsets: Sequence[int], data: memoryview) -> None:
+        """Initialize a table of the strings in <data> starting at the given offsets."""
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        """Return the number of strings in this table."""
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        """Return string i of this table.
+
+        Raise an IndexError if there is no string i.
+        """
+        if not 0 <= i < len(self):
+            raise IndexError
+
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+
+class CompactGraph:
+    """A read-only friend recommendation graph stored in flat arrays instead of vertex objects.
+
+    Users are interned to the integers 0 to n - 1 in sorted order of their user ids, and
+    preferences to their bit in the preference bitmasks. The friends of every user and the users
+    of every preference are stored in compressed sparse row (CSR) form: the neighbours of row i
+    are indices[indptr[i]:indptr[i + 1]], in increasing order.
+
+    The public methods are the same as those of Graph, and return the same results on the same
+    data.
+
+    A compact graph can be saved to a binary snapshot file, and loaded back by memory-mapping the
+    file, so that loading is near-instant and processes loading the same snapshot share its pages.
+
+    Instance Attributes:
+        - snapshot_time: the time (in seconds since the epoch) of the data in this graph, if it
+          was saved to or loaded from a snapshot, and None otherwise
+    """
+    snapshot_time: Optional[float]
+
+    # Private Instance Attributes:
+    #     - _users:
+    #         The user ids, sorted, so that user i is _users[i].
+    #     - _preferences:
+    #         The preferences, so that the preference with bit b is _preferences[b].
+    #     - _preference_bits:
+    #         Maps a preference to its bit.
+    #     - _words:
+    #         The number of 64-bit words in a preference bitmask.
+    #     - _masks:
+    #         The preference bitmasks of the users; word w of the bitmask of user i is
+    #         _masks[i * _words + w].
+    #     - _friend_indptr, _friend_indices:
+    #         The friends of every user, in CSR form.
+    #     - _preference_indptr, _preference_indices:
+    #         The users who like every preference, in CSR form.
+    #     - _buffer:
+    #         The memory-mapped snapshot file the arrays are views of, or None.
+    _users: Sequence[str]
+    _preferences: list[str]
+    _preference_bits: dict[str, int]
+    _words: int
+    _masks: Sequence[int]
+    _friend_indptr: Sequence[int]
+    _friend_indices: Sequence[int]
+    _preference_indptr: Sequence[int]
+    _preference_indices: Sequence[int]
+    _buffer: Optional[mmap.mmap]
+
+    def __init__(self, users: Iterable[tuple[str, Iterable[str], Iterable[str]]]) -> None:
+        """Initialize a graph of the given (user id, preferences, friends) triples.
+
+        The preferences in constants.CATEGORIES get the lowest bits, in order, and any other
+        preference gets the next free bit. Friendships are symmetric: a friend listed by either
+        user makes the two users adjacent. Friends that are not users of the graph are ignored.
+        """
+        users = list(users)
+
+        self.snapshot_time = None
+        self._buffer = None
+
+        self._users = sorted({user for user, _, _ in users})
+        self._preferences = [preference for category in constants.CATEGORIES
+                             for preference in constants.CATEGORIES[category]]
+        self._preference_bits = {preference: bit
+                                 for bit, preference in enumerate(self._preferences)}
+
+        # The index of every user and the adjacency sets are only needed while building
+        index = {user: i for i, user in enumerate(self._users)}
+        masks = [0] * len(self._users)
+        friends = [set() for _ in self._users]
+
+        for user, preferences, user_friends in users:
+            i = index[user]
+
+            for preference in preferences:
+                if preference not in self._preference_bits:
+                    self._preference_bits[preference] = len(self._preferences)
+                    self._preferences.append(preference)
+
+                masks[i] |= 1 << self._preference_bits[preference]
+
+            for friend in user_friends:
+                if friend in index and friend != user:
+                    friends[i].add(index[friend])
+                    friends[index[friend]].add(i)
+
+        self._words = max(1, -(-len(self._preferences) // _WORD))
+        self._masks = array('Q', [(mask >> (w * _WORD)) & 0xFFFFFFFFFFFFFFFF
+                                  for mask in masks for w in range(self._words)])
+
+        self._friend_indptr, self._friend_indices = CompactGraph._to_csr(
+            [sorted(row) for row in friends])
+
+        users_of = [[] for _ in self._preferences]
+        for i, mask in enumerate(masks):
+            for bit in CompactGraph._get_bits(mask):
+                users_of[bit].append(i)
+
+        self._preference_indptr, self._preference_indices = CompactGraph._to_csr(users_of)
+
+    @staticmethod
+    def from_graph(graph: Graph) -> CompactGraph:
+        """Return a compact copy of the users, preferences and friendships of <graph>."""
+        return CompactGraph((user,
+                             graph.get_neighbours(user, 'preference'),
+                             graph.get_neighbours(user, 'user'))
+                            for user in graph.get_all_vertices('user'))
+
+    @staticmethod
+    def load_friends_graph(handler: DataHandler) -> CompactGraph:
+        """Return a compact friend recommendation graph of the firebase data using a handler
+
+        This holds the same data as Graph.load_friends_graph, without building a Graph first.
+        """
+        return CompactGraph((user['userID'],
+                             [preference for category in constants.CATEGORIES
+                              for preference in user.get(category, [])],
+                             user.get('friends', []))
+                            for user in handler.iter_all_data(constants.GRAPH_FIELDS))
+
+    def save_snapshot(self, path: str, snapshot_time: float) -> None:
+        """Save this graph to a binary snapshot file at <path>.
+
+        <snapshot_time> should be taken *before* the data of this graph was read, so that no
+        change made while it was read is missed when the snapshot is brought up to date.
+        """
+        self.snapshot_time = snapshot_time
+
+        user_data = [user.encode('utf-8') for user in self._users]
+        preference_data = [preference.encode('utf-8') for preference in self._preferences]
+
+        sections = [_encode_offsets(user_data), b''.join(user_data),
+                    _encode_offsets(preference_data), b''.join(preference_data),
+                    array('Q', self._masks).tobytes(),
+                    array('q', self._friend_indptr).tobytes(),
+                    array('i', self._friend_indices).tobytes(),
+                    array('q', self._preference_indptr).tobytes(),
+                    array('i', self._preference_indices).tobytes()]
+
+        header = _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION,
+                                       1 if sys.byteorder == 'little' else 0, snapshot_time,
+                                       len(self._users), len(sections[1]),
+                                       len(self._preferences), len(sections[3]), self._words,
+                                       len(self._friend_indices),
+                                       len(self._preference_indices))
+
+        with open(path, 'wb') as file:
+            file.write(header)
+
+            # Every section starts at a multiple of 8 bytes, so that it can be viewed as an array
+            for section in sections:
+                file.write(section)
+                file.write(bytes(-len(section) % 8))
+
+    @staticmethod
+    def load_snapshot(path: str) -> CompactGraph:
+        """Return the graph saved in the snapshot file at <path>, by memory-mapping the file.
+
+        Raise a ValueError if the file is not a snapshot this code can read.
+        """
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, little_endian, snapshot_time, num_users, user_bytes, num_preferences, \
+            preference_bytes, words, num_friends, num_preference_users = \
+            _SNAPSHOT_HEADER.unpack_from(buffer)
+
+        if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION or \
+                little_endian != (sys.byteorder == 'little'):
+            raise ValueError
+
+        view = memoryview(buffer)
+        position = _SNAPSHOT_HEADER.size
+        parts = []
+
+        for length, format_ in [((num_users + 1) * 8, 'q'), (user_bytes, 'B'),
+                                ((num_preferences + 1) * 8, 'q'), (preference_bytes, 'B'),
+                                (num_users * words * 8, 'Q'), ((num_users + 1) * 8, 'q'),
+                                (num_friends * 4, 'i'), ((num_preferences + 1) * 8, 'q'),
+                                (num_preference_users * 4, 'i')]:
+            parts.append(view[position:position + length].cast(format_))
+            position += length + (-length % 8)
+
+        graph = CompactGraph([])
+        graph.snapshot_time = snapshot_time
+        graph._buffer = buffer
+
+        graph._users = _StringTable(parts[0], parts[1])
+        graph._preferences = list(_StringTable(parts[2], parts[3]))
+        graph._preference_bits = {preference: bit
+                                  for bit, preference in enumerate(graph._preferences)}
+        graph._words = words
+        graph._masks = parts[4]
+        graph._friend_indptr, graph._friend_indices = parts[5], parts[6]
+        graph._preference_indptr, graph._preference_indices = parts[7], parts[8]
+
+        return graph
+
+    def to_graph(self) -> Graph:
+        """Return a Graph with the same users, preferences and friendships as this graph.
+
+        The preferences are added in the order of their bits, so that the bitmasks of the users
+        are the same in both graphs.
+        """
+        graph = Graph()
+
+        for preference in self._preferences:
+            graph.add_vertex(preference, 'preference')
+
+        for i, user in enumerate(self._users):
+            graph.add_vertex(user, 'user')
+
+            for bit in CompactGraph._get_bits(self._get_mask(i)):
+                graph.add_edge(user, self._preferences[bit])
+
+        for i, user in enumerate(self._users):
+            for j in self._get_friends(i):
+                if j < i:
+                    graph.add_edge(user, self._users[j])
+
+        return graph
+
+    def get_user_count(self) -> int:
+        """Return the number of users in this graph."""
+        return len(self._users)
+
+    def get_user_range(self, start: int, end: int) -> list[str]:
+        """Return the user ids of the users start to end - 1, in sorted order of user id.
+
+        Preconditions:
+            - 0 <= start <= end <= self.get_user_count()
+        """
+        return [self._users[i] for i in range(start, end)]
+
+    def adjacent(self, item1: Any, item2: Any) -> bool:
+        """Return whether item1 and item2 are adjacent vertices in this graph.
+
+        Return False if item1 or item2 do not appear as vertices in this graph.
+        """
+        if item1 in self._preference_bits:
+            item1, item2 = item2, item1
+
+        if item1 in self._preference_bits:
+            return False
+
+        i = self._find_user(item1)
+
+        if i == -1:
+            return False
+        elif item2 in self._preference_bits:
+            return (self._get_mask(i) >> self._preference_bits[item2]) & 1 == 1
+
+        j = self._find_user(item2)
+
+        if j == -1:
+            return False
+
+        start, end = self._friend_indptr[i], self._friend_indptr[i + 1]
+        position = bisect_left(self._friend_indices, j, start, end)
+
+        return position < end and self._friend_indices[position] == j
+
+    def get_neighbours(self, item: Any, kind: str = '') -> set:
+        """Return a set of the neighbours of the given item.
+
+        If kind != '', only return the neighbours of the given vertex kind.
+
+        Raise a ValueError if item does not appear as a vertex in this graph.
+
+        Preconditions:
+            - kind in {'', 'user', 'preference'}
+        """
+        if item in self._preference_bits:
+            bit = self._preference_bits[item]
+
+            if kind == 'preference':
+                return set()
+
+            return {self._users[j] for j in self._preference_indices[
+                self._preference_indptr[bit]:self._preference_indptr[bit + 1]]}
+
+        i = self._find_user(item)
+
+        if i == -1:
+            raise ValueError
+
+        neighbours = set()
+
+        if kind != 'preference':
+            neighbours.update(self._users[j] for j in self._get_friends(i))
+
+        if kind != 'user':
+            neighbours.update(self._preferences[bit] for bit in
+                              CompactGraph._get_bits(self._get_mask(i)))
+
+        return neighbours
+
+    def get_all_vertices(self, kind: str = '') -> set:
+        """Return a set of all vertex items in this graph.
+
+        If kind != '', only return the items of the given vertex kind.
+
+        Preconditions:
+            - kind in {'', 'user', 'preference'}
+        """
+        if kind == 'user':
+            return set(self._users)
+        elif kind == 'preference':
+            return set(self._preferences)
+        else:
+            return set(self._users).union(self._preferences)
+
+    def get_similarity_score(self, item1: Any, item2: Any) -> float:
+        """Return the similarity score between the two given users in this graph.
+
+        Raise a ValueError if item1 or item2 do not appear as users in this graph.
+        """
+        i = self._find_user(item1)
+        j = self._find_user(item2)
+
+        if i == -1 or j == -1:
+            raise ValueError
+
+        return CompactGraph._similarity(self._get_mask(i), self._get_mask(j))
+
+    def recommend_friends(self, user: str, limit: int, offset: int = 0) -> list[str]:
+        """Return a list of up to <limit> recommended friends based on similarity to the given user.
+
+        See Graph.recommend_friends.
+
+        Preconditions:
+            - user in self.get_all_vertices('user')
+            - limit >= 1
+            - offset >= 0
+        """
+        return [format_match(score, other)
+                for score, other in self.get_top_matches(user, limit, offset)]
+
+    def get_top_matches(self, user: str, limit: int,
+                        offset: int = 0) -> list[tuple[float, str]]:
+        """Return the (similarity score, user) pairs of the users recommended to the given user.
+
+        See Graph.get_top_matches.
+
+        Preconditions:
+            - user in self.get_all_vertices('user')
+            - limit >= 1
+            - offset >= 0
+        """
+        i = self._find_user(user)
+        mask = self._get_mask(i)
+
+        candidates = set()
+        for bit in CompactGraph._get_bits(mask):
+            candidates.update(self._preference_indices[
+                self._preference_indptr[bit]:self._preference_indptr[bit + 1]])
+
+        candidates.discard(i)
+        candidates.difference_update(self._get_friends(i))
+
+        # The users are numbered in sorted order of user id, so ties are broken the same way
+        # by index as by user id, and only the returned user ids have to be looked up
+        if self._words == 1:
+            masks = self._masks
+            scores = ((CompactGraph._similarity(mask, masks[j]), j) for j in candidates)
+        else:
+            scores = ((CompactGraph._similarity(mask, self._get_mask(j)), j) for j in candidates)
+
+        return [(score, self._users[j])
+                for score, j in heapq.nlargest(offset + limit, scores)[offset:]]
+
+    def recommend_friends_of_friends(self, user: str, limit: int, offset: int = 0,
+                                     blend: float = 0.0) -> list[str]:
+        """Return a list of up to <limit> recommended friends based on the friends they share with
+        the given user.
+
+        See Graph.recommend_friends_of_friends.
+
+        Preconditions:
+            - user in self.get_all_vertices('user')
+            - limit >= 1
+            - offset >= 0
+            - 0.0 <= blend <= 1.0
+        """
+        return [format_mutual_friends(count, other) for _, count, other in
+                self.get_mutual_friend_matches(user, limit, offset, blend)]
+
+    def get_mutual_friend_matches(self, user: str, limit: int, offset: int = 0,
+                                  blend: float = 0.0,
+                                  max_degree: int = constants.MAX_MUTUAL_FRIEND_DEGREE) \
+            -> list[tuple[float, int, str]]:
+        """Return the (score, mutual friends, user) triples of the users recommended to the given
+        user by recommend_friends_of_friends, in the same order.
+
+        See Graph.get_mutual_friend_matches. The degree of a user here only counts their
+        friends, not their preferences.
+
+        Preconditions:
+            - user in self.get_all_vertices('user')
+            - limit >= 1
+            - offset >= 0
+            - 0.0 <= blend <= 1.0
+        """
+        i = self._find_user(user)
+        friends = self._get_friends(i)
+        excluded = set(friends)
+        excluded.add(i)
+
+        mutual_friends = {}
+
+        for j in friends:
+            if self._friend_indptr[j + 1] - self._friend_indptr[j] <= max_degree:
+                for k in self._get_friends(j):
+                    if k not in excluded:
+                        mutual_friends[k] = mutual_friends.get(k, 0) + 1
+
+        mask = self._get_mask(i)
+
+        scores = (((1 - blend) * count / len(friends) +
+                   blend * CompactGraph._similarity(mask, self._get_mask(k)), count, k)
+                  for k, count in mutual_friends.items())
+
+        return [(score, count, self._users[k])
+                for score, count, k in heapq.nlargest(offset + limit, scores)[offset:]]
+
+    def generate_users_graph_for_user(self, user: str, d: int,
+                                      max_vertices: Optional[int] = None) -> Graph:
+        """ Return a graph of a users and their friends until depth d
+
+        See Graph.generate_users_graph_for_user.
+
+        :param user: the user ID of the user
+        :param d: the depth
+        :param max_vertices: the maximum number of users in the returned graph
+        """
+        distances = self.get_ego_network(user, d, max_vertices)
+
+        graph = Graph()
+
+        for item in distances:
+            graph.add_vertex(item, 'user')
+
+        for item in distances:
+            for j in self._get_friends(self._find_user(item)):
+                if self._users[j] in distances:
+                    graph.add_edge(item, self._users[j])
+
+        return graph
+
+    def get_ego_network(self, user: str, d: int,
+                        max_vertices: Optional[int] = None) -> dict[str, int]:
+        """Return the users at most d friendships away from the given user, mapped to their
+        distance.
+
+        See Graph.get_ego_network.
+        """
+        i = self._find_user(user)
+
+        if i == -1:
+            raise ValueError
+
+        distances = {i: 0}
+        frontier = [i]
+
+        for distance in range(1, d + 1):
+            next_frontier = []
+
+            for j in frontier:
+                for k in self._get_friends(j):
+                    if k not in distances:
+                        if max_vertices is not None and len(distances) >= max_vertices:
+                            return {self._users[index]: dist for index, dist in distances.items()}
+
+                        distances[k] = distance
+                        next_frontier.append(k)
+
+            frontier = next_frontier
+
+        return {self._users[index]: dist for index, dist in distances.items()}
+
+    def _find_user(self, user: Any) -> int:
+        """Return the index of <user>, or -1 if <user> is not a user of this graph."""
+        i = bisect_left(self._users, user) if isinstance(user, str) else len(self._users)
+
+        if i < len(self._users) and self._users[i] == user:
+            return i
+        else:
+            return -1
+
+    def _get_mask(self, i: int) -> int:
+        """Return the preference bitmask of user i."""
+        if self._words == 1:
+            return self._masks[i]
+
+        mask = 0
+        for w in range(self._words):
+            mask |= self._masks[i * self._words + w] << (w * _WORD)
+
+        return mask
+
+    def _get_friends(self, i: int) -> Sequence[int]:
+        """Return the indices of the friends of user i."""
+        return self._friend_indices[self._friend_indptr[i]:self._friend_indptr[i + 1]]
+
+    @staticmethod
+    def _similarity(mask1: int, mask2: int) -> float:
+        """Return the similarity score between users with the preference bitmasks mask1, mask2."""
+        denominator = count_bits(mask1 | mask2)
+
+        if denominator != 0:
+            return count_bits(mask1 & mask2) / denominator
+        else:
+            return 0
+
+    @staticmethod
+    def _get_bits(mask: int) -> list[int]:
+        """Return the positions of the bits set in <mask>, in increasing order."""
+        bits = []
+
+        while mask:
+            lowest = mask & -mask
+            bits.append(lowest.bit_length() - 1)
+            mask ^= lowest
+
+        return bits
+
+    @staticmethod
+    def _to_csr(rows: list[list[int]]) -> tuple[array, array]:
+        """Return the (indptr, indices) arrays of the given rows in CSR form."""
+        indptr = array('q', [0])
+        indices = array('i')
+
+        for row in rows:
+            indices.extend(row)
+            indptr.append(len(indices))
+
+        return indptr, indices
+
+
+def load_graph_from_snapshot(path: str, handler: DataHandler) -> Graph:
+    """Return the friend recommendation graph of the firebase data, starting from the snapshot at
+    <path> and applying only the documents that changed since the snapshot was taken.
+
+    This holds the same data as Graph.load_friends_graph(handler), but only reads the users
+    deleted, registered or updated since the snapshot, so the reads grow with the number of
+    changes instead of the number of users.
+    """
+    compact = CompactGraph.load_snapshot(path)
+    graph = compact.to_graph()
+
+    # The deleted users are removed first, so that a user registered again since is kept
+    for user in handler.get_user_ids_deleted_since(compact.snapshot_time):
+        graph.remove_user(user)
+
+    changed = handler.get_data_updated_since(compact.snapshot_time)
+
+    # Every changed user is added before any friendship, as in Graph.load_friends_graph
+    for user in changed:
+        graph.add_vertex(user['userID'], 'user')
+
+    for user in changed:
+        graph.update_user(user['userID'], user)
+
+    return graph
+
+
+def _encode_offsets(strings: list[bytes]) -> bytes:
+    """Return the offsets of <strings> stored one after another, followed by their total length,
+    as an array of 64-bit integers."""
+    offsets = array('q', [0])
+
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+
+    return offsets.tobytes()
+
+
+if __name__ == '__main__':
+    # The code below saves a snapshot of the firebase data, and is meant to be run periodically:
+
+    #     import time
+    #     handler = DataHandler()
+    #     now = time.time()
+    #     CompactGraph.load_friends_graph(handler).save_snapshot(constants.GRAPH_SNAPSHOT, now)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing',
+                          'array',
+                          'bisect',
+                          'heapq',
+                          'mmap',
+                          'struct',
+                          'sys',
+                          'authenticate',
+                          'recommendation_graph',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
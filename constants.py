@@ -3,10 +3,15 @@
 By Eeshan Narula and Avnish Pasari
 """
 
+from typing import Optional
+
 import sys
 import pyfiglet
 
 COLLECTION = "data"
+
+# The collection of the tombstones of the deleted users
+DELETED_COLLECTION = "deleted"
 KEYS = "keys.json"
 ABOUTUS = "AboutUs.txt"
 
@@ -14,6 +19,80 @@ QUESTIONSLIMIT = 3
 
 DEPTH = 2
 
+MAX_NETWORK_VERTICES = 500
+
+MAX_PLOT_ELEMENTS = 2000
+
+RECOMMENDATION_ENGINE = 'numpy'
+
+RECOMMENDATIONS_PER_PAGE = 10
+
+MORE_RECOMMENDATIONS = 'More recommendations'
+
+RECOMMENDATION_CACHE_SIZE = 256
+
+# The number of recommendations scored at once, from which the pages are sliced
+RECOMMENDATION_RANKING_DEPTH = 100
+
+MAX_MUTUAL_FRIEND_DEGREE = 1000
+
+MUTUAL_FRIENDS_BLEND = 0.25
+
+MINHASH_BANDS = 20
+
+MINHASH_ROWS = 2
+
+GRAPH_SNAPSHOT = 'data/graph.snapshot'
+
+RECOMMENDATION_TABLE = 'data/recommendations'
+
+RECOMMENDATION_TABLE_LIMIT = 50
+
+RECOMMENDATION_TABLE_MAX_AGE = 24 * 60 * 60
+
+SHARDS_PER_PROCESS = 4
+
+INSTRUMENT_DATA_HANDLER = False
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+USER_CACHE_SIZE = 1024
+
+USER_CACHE_TTL = 60
+
+PAGE_SIZE = 1000
+
+MAX_BATCH_WRITES = 500
+
+IMPORT_BATCH_SIZE = 500
+
+IMPORT_WORKERS = 8
+
+IMPORT_CHECKPOINT = 'data/import.checkpoint'
+
+# The database the users are stored in, either 'firestore' or 'sqlite'
+STORAGE_BACKEND = 'firestore'
+
+SQLITE_DATABASE = 'data/friendify.sqlite3'
+
+SQLITE_BATCH_SIZE = 10000
+
+SQLITE_POLL_INTERVAL = 1
+
+# Whether the graph and the cache of the data handler are kept up to date with the changes made
+# by other sessions
+LISTEN_FOR_CHANGES = False
+
+CHANGE_FEED_BATCH_DELAY = 0.1
+
+CHANGE_FEED_MAX_BATCH = 500
+
+# The maximum number of users read by one batched read
+GET_USERS_CHUNK_SIZE = 100
+
+# The maximum number of database calls made at the same time by an async data handler
+ASYNC_WORKERS = 16
+
 DATA = 'data/Survey.csv'
 
 THANKYOU = "Thank you for using Friendify 🙏 😀"
@@ -82,6 +161,9 @@ CATEGORIES = {
 
 }
 
+# The fields of a user used to build the friend recommendation graph
+GRAPH_FIELDS = ['userID', 'friends', *CATEGORIES]
+
 QUESTIONS = {
 
     'log_questions': [
@@ -130,7 +212,8 @@ QUESTIONS = {
             'type': 'list',
             'name': 'options',
             'message': 'What will you like to do',
-            'choices': ['see friend recommendations', 'View your network',
+            'choices': ['see friend recommendations', 'see friends of your friends',
+                        'View your network',
                         'change your preferences', 'My friends', 'Search for people',
                         'your profile', 'Delete account', 'Logout']
         }
@@ -252,10 +335,12 @@ PROFILEQUESTIONS = [
 ]
 
 
-def profile(data: dict) -> str:
+def profile(data: dict, friends: Optional[dict[str, dict]] = None) -> str:
     """Return string representation of a profile
 
     :param data: data of a user as retrieved from firebase database
+    :param friends: the data of the friends of the user keyed by user ID, e.g. as returned by
+    DataHandler.get_users, to show the interests of each friend next to their username
     """
     string_so_far = f'Username: {data["userID"]} \n \n'
     if 'movies' in data:
@@ -267,11 +352,28 @@ def profile(data: dict) -> str:
     if 'games' in data:
         string_so_far += 'Favourite games: ' + ', '.join(data['games']) + '\n \n'
     if 'friends' in data:
-        string_so_far += 'Friends: \n' + '\n'.join(data['friends'])
+        string_so_far += 'Friends: \n' + '\n'.join(friend_summary(friend, friends)
+                                                    for friend in data['friends'])
 
     return string_so_far
 
 
+def friend_summary(user_id: str, friends: Optional[dict[str, dict]]) -> str:
+    """Return a line about a friend for their profile: their username, and their number of
+    friends and preferences if their data is in <friends>
+
+    :param user_id: the user ID of the friend
+    :param friends: the data of the friends keyed by user ID, or None
+    """
+    if friends is None or user_id not in friends:
+        return user_id
+
+    data = friends[user_id]
+    preferences = [preference for category in CATEGORIES for preference in data.get(category, [])]
+
+    return f'{user_id} ({len(data.get("friends", []))} friends): ' + ', '.join(preferences)
+
+
 def generate_question_with_choices(choices: list[str], message: str) -> list[dict]:
     """Generate a multiple choice single select question with <choices> and <message> and return it
     in py-inquirer format
@@ -330,7 +432,8 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['sys',
+        'extra-imports': ['typing',
+                          'sys',
                           'pyfiglet'],  # the names (strs) of imported modules
         'allowed-io': ['print_logo'],  # the names (strs) of functions that call print/open/input
         'max-line-length': 100,
@@ -0,0 +1,283 @@
+"""File contains the FirestoreBackend class, which stores the users of the app in the firebase
+firestore database
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator, Optional
+
+from firebase_admin.exceptions import FirebaseError
+
+import firebase_admin
+from firebase_admin import credentials
+from firebase_admin import firestore
+
+from custom_exceptions import DataDidNotLoadError
+from instrumentation import Instrumentation
+from storage import DocumentChange, StorageBackend
+import constants
+
+
+class FirestoreBackend(StorageBackend):
+    """A storage backend keeping one firestore document per user in the collection
+    constants.COLLECTION, with the user ID as the document ID.
+
+    Instance Attributes:
+        - cred: a certificate used to connect to the firebase server
+        - app: an object representing the firebase server
+        - db: an object representing firebase firestore database
+    """
+    cred: credentials.Certificate
+    app: firebase_admin.App
+    db: firebase_admin.firestore.client
+
+    def __init__(self, keys: str = constants.KEYS) -> None:
+        """Initialize a backend connected to the firebase server with the credentials in the
+        file <keys>.
+        """
+        self.cred = credentials.Certificate(keys)
+        self.app = firebase_admin.initialize_app(self.cred)
+
+        self.db = firestore.client()
+
+        self.batch_size = constants.MAX_BATCH_WRITES
+
+    def instrument(self, instrumentation: Instrumentation) -> None:
+        """Record the reads, writes and deletes made by this backend in <instrumentation>."""
+        self.db = instrumentation.instrument_client(self.db)
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        """Return the document of the given user, or None if the user does not exist."""
+        try:
+            user = self.db.collection(constants.COLLECTION).document(user_id).get()
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+        return user.to_dict() if user.exists else None
+
+    def get_users(self, user_ids: list[str],
+                  fields: Optional[list[str]] = None) -> dict[str, dict]:
+        """Return the documents of the given users who exist, keyed by user ID, with only the
+        given fields if <fields> is not None. The users are read with a single batched read.
+        """
+        if not user_ids:
+            return {}
+
+        collection = self.db.collection(constants.COLLECTION)
+
+        try:
+            return {snapshot.id: snapshot.to_dict() for snapshot in
+                    self.db.get_all([collection.document(user_id) for user_id in user_ids],
+                                    field_paths=fields)
+                    if snapshot.exists}
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+    def iter_users(self, fields: Optional[list[str]], page_size: int) -> Iterator[dict]:
+        """Yield the documents of all the users in order of user ID, with only the given fields
+        if <fields> is not None, reading <page_size> users at a time.
+
+        Each page is a query starting after the last document of the previous page.
+
+        Preconditions:
+            - page_size >= 1
+        """
+        query = self.db.collection(constants.COLLECTION). \
+            order_by(firestore.FieldPath.document_id()).limit(page_size)
+
+        if fields is not None:
+            query = query.select(fields)
+
+        page = None
+
+        while page is None or len(page) == page_size:
+            try:
+                page = (query if page is None else query.start_after(page[-1])).get()
+            except FirebaseError:
+                raise DataDidNotLoadError
+
+            for entry in page:
+                if entry.exists:
+                    yield entry.to_dict()
+
+    def get_user_ids(self) -> list[str]:
+        """Return the user IDs of all the users, without reading their documents."""
+        try:
+            return [reference.id for reference in
+                    self.db.collection(constants.COLLECTION).list_documents()]
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+    def get_users_updated_since(self, timestamp: float) -> list[dict]:
+        """Return the documents of the users written after <timestamp>, a time in seconds since
+        the epoch.
+        """
+        return self._get_matching_users('updatedAt', '>',
+                                        datetime.fromtimestamp(timestamp, timezone.utc))
+
+    def get_user_ids_deleted_since(self, timestamp: float) -> list[str]:
+        """Return the user IDs of the users deleted after <timestamp>, a time in seconds since
+        the epoch, from the tombstones written by remove_friendships.
+        """
+        query = self.db.collection(constants.DELETED_COLLECTION).where(
+            'deletedAt', '>', datetime.fromtimestamp(timestamp, timezone.utc)).select(['userID'])
+
+        try:
+            return [entry.to_dict()['userID'] for entry in query.get() if entry.exists]
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+    def get_user_ids_with_preference(self, category: str, preference: str) -> list[str]:
+        """Return the user IDs of the users who like <preference> in the given category."""
+        return [user['userID'] for user in
+                self._get_matching_users(category, 'array_contains', preference, ['userID'])]
+
+    def set_user(self, user_id: str, user_data: dict, merge: bool = False) -> None:
+        """Write the document of the given user. If <merge> is True, only the fields in
+        <user_data> are changed and the user must exist; otherwise the whole document is
+        replaced by <user_data>.
+        """
+        try:
+            self.db.collection(constants.COLLECTION).document(user_id).set(
+                {**user_data, 'updatedAt': firestore.SERVER_TIMESTAMP}, merge=merge)
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+    def add_users(self, users: list[dict]) -> None:
+        """Write the documents of the given new users in a single batched write.
+
+        Preconditions:
+            - len(users) <= self.batch_size
+        """
+        collection = self.db.collection(constants.COLLECTION)
+        batch = self.db.batch()
+
+        for user_data in users:
+            batch.set(collection.document(user_data['userID']),
+                      {**user_data, 'updatedAt': firestore.SERVER_TIMESTAMP})
+
+        try:
+            batch.commit()
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+    def set_friendship(self, user1: str, user2: str, friends: bool) -> None:
+        """Add each of the two users to the friends of the other, or remove them if <friends>
+        is False, in a single batched write.
+
+        The friends are changed with array-union (or array-remove) transforms, so neither
+        document is read, and friendships changed at the same time by other sessions are never
+        overwritten.
+
+        Preconditions:
+            - user1 and user2 exist
+        """
+        transform = firestore.ArrayUnion if friends else firestore.ArrayRemove
+        collection = self.db.collection(constants.COLLECTION)
+        batch = self.db.batch()
+
+        for user, friend in ((user1, user2), (user2, user1)):
+            batch.update(collection.document(user),
+                         {'friends': transform([friend]), 'updatedAt': firestore.SERVER_TIMESTAMP})
+
+        try:
+            batch.commit()
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+    def remove_friendships(self, user_id: str, friends: list[str], delete: bool) -> None:
+        """Remove both sides of the friendships of the given user with <friends> in a single
+        batched write, and delete the user in the same batch if <delete> is True.
+
+        Updating a missing document would fail the whole batch, so the friends who exist are
+        found first with one batched read. A deleted user leaves a tombstone in
+        constants.DELETED_COLLECTION, written in the same batch.
+
+        Preconditions:
+            - len(friends) < self.batch_size - 1
+        """
+        collection = self.db.collection(constants.COLLECTION)
+        existing = self.get_users(friends, ['userID'])
+        batch = self.db.batch()
+
+        for friend in friends:
+            if friend in existing:
+                batch.update(collection.document(friend),
+                             {'friends': firestore.ArrayRemove([user_id]),
+                              'updatedAt': firestore.SERVER_TIMESTAMP})
+
+        if delete:
+            batch.delete(collection.document(user_id))
+            batch.set(self.db.collection(constants.DELETED_COLLECTION).document(user_id),
+                      {'userID': user_id, 'deletedAt': firestore.SERVER_TIMESTAMP})
+        else:
+            batch.update(collection.document(user_id),
+                         {'friends': firestore.ArrayRemove(friends),
+                          'updatedAt': firestore.SERVER_TIMESTAMP})
+
+        try:
+            batch.commit()
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+    def listen(self, callback: Callable[[list[DocumentChange]], None]) -> Callable[[], None]:
+        """Call <callback> with the changes of the users, in the order they were made, on a
+        background thread, until the returned function is called.
+
+        The changes are pushed by a firestore snapshot listener on the collection, whose first
+        snapshot reports every existing user as 'added'.
+        """
+        def on_snapshot(_: list, changes: list, read_time: datetime) -> None:
+            callback([FirestoreBackend._to_document_change(change, read_time)
+                      for change in changes])
+
+        try:
+            watch = self.db.collection(constants.COLLECTION).on_snapshot(on_snapshot)
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+        return watch.unsubscribe
+
+    @staticmethod
+    def _to_document_change(change: Any, read_time: datetime) -> DocumentChange:
+        """Return the DocumentChange of a firestore document change read at <read_time>."""
+        kind = change.type.name.lower()
+
+        return DocumentChange(kind, change.document.id,
+                              None if kind == 'removed' else change.document.to_dict(),
+                              read_time.timestamp())
+
+    def _get_matching_users(self, field: str, operator: str, value: object,
+                            fields: Optional[list[str]] = None) -> list[dict]:
+        """Return the documents of the users whose <field> compares with <value> by <operator>,
+        with only the given fields if <fields> is not None.
+        """
+        query = self.db.collection(constants.COLLECTION).where(field, operator, value)
+
+        if fields is not None:
+            query = query.select(fields)
+
+        try:
+            return [entry.to_dict() for entry in query.get() if entry.exists]
+        except FirebaseError:
+            raise DataDidNotLoadError
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['datetime',
+                          'typing',
+                          'firebase_admin',
+                          'firebase_admin.exceptions',
+                          'custom_exceptions',
+                          'instrumentation',
+                          'storage',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -0,0 +1,379 @@
+"""File contains the Instrumentation class, used to count the firebase firestore reads, writes and
+deletes made by a DataHandler and to measure the latency of its methods
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator, TextIO
+
+import bisect
+import functools
+import inspect
+import sys
+import threading
+import time
+
+import constants
+
+# The operations counted, in the order they are reported
+OPERATIONS = ('reads', 'writes', 'deletes')
+
+# The firestore methods that return another reference, query or batch to instrument
+_CHAINED_METHODS = {'collection', 'document', 'where', 'select', 'limit', 'offset', 'order_by',
+                    'start_at', 'start_after', 'end_at', 'end_before', 'batch'}
+
+# The firestore methods that write or delete one document
+_WRITE_METHODS = {'set', 'update', 'create'}
+_DELETE_METHODS = {'delete'}
+
+# The firestore methods that read documents, and return a snapshot, a list or an iterator of them
+_READ_METHODS = {'get', 'stream', 'get_all', 'list_documents'}
+
+
+class LatencyHistogram:
+    """A histogram of the latencies of calls, with buckets bounded by
+    constants.LATENCY_BUCKETS_MS.
+
+    Instance Attributes:
+        - counts: counts[i] is the number of calls that took at most
+          constants.LATENCY_BUCKETS_MS[i] milliseconds (and more than the previous bound), and
+          the last count is the number of calls slower than every bound
+        - total_seconds: the total time taken by all the calls
+
+    Representation Invariants:
+        - len(self.counts) == len(constants.LATENCY_BUCKETS_MS) + 1
+    """
+    counts: list[int]
+    total_seconds: float
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.counts = [0] * (len(constants.LATENCY_BUCKETS_MS) + 1)
+        self.total_seconds = 0.0
+
+    def add(self, seconds: float) -> None:
+        """Record a call that took <seconds> seconds."""
+        self.counts[bisect.bisect_left(constants.LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.total_seconds += seconds
+
+    def get_percentile(self, percentile: float) -> float:
+        """Return the bound in milliseconds of the bucket holding the given percentile of the
+        calls, or infinity if it is in the last bucket.
+
+        Preconditions:
+            - sum(self.counts) > 0
+            - 0 < percentile <= 100
+        """
+        rank = percentile / 100 * sum(self.counts)
+        seen = 0
+
+        for bound, count in zip(constants.LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+
+            if seen >= rank:
+                return bound
+
+        return float('inf')
+
+
+class CallStats:
+    """The firestore operations made by the calls of a method, or during a screen, and the latency
+    of those calls.
+
+    Instance Attributes:
+        - calls: the number of calls
+        - operations: maps each of OPERATIONS to the number of those operations made
+        - latency: the histogram of the latencies of the calls
+    """
+    calls: int
+    operations: dict[str, int]
+    latency: LatencyHistogram
+
+    def __init__(self) -> None:
+        """Initialize the statistics of no calls."""
+        self.calls = 0
+        self.operations = dict.fromkeys(OPERATIONS, 0)
+        self.latency = LatencyHistogram()
+
+    def add(self, operations: dict[str, int], seconds: float) -> None:
+        """Record a call that made the given operations and took <seconds> seconds."""
+        self.calls += 1
+        self.latency.add(seconds)
+
+        for operation in OPERATIONS:
+            self.operations[operation] += operations[operation]
+
+
+class Instrumentation:
+    """The firestore operations made by a DataHandler and the latencies of its public methods.
+
+    Every firestore operation is counted for each method of the handler that is running when it
+    is made, so the operations of a method include those of the methods it calls, e.g. the read
+    made by is_user when update_user_data calls it. Only the calls made from outside the handler
+    are counted for the screen, so that every operation is counted once per screen.
+
+    Instance Attributes:
+        - screen: the name of the screen currently shown, to which calls are attributed
+        - methods: maps the name of each method of the handler to the statistics of its calls
+        - screens: maps the name of each screen to the statistics of the calls made from it
+    """
+    screen: str
+    methods: dict[str, CallStats]
+    screens: dict[str, CallStats]
+
+    # Private Instance Attributes:
+    #     - _lock:
+    #         The lock held while the statistics are updated.
+    #     - _local:
+    #         The per-thread stack of the operations made by each running method call,
+    #         from the outermost to the innermost, in the attribute 'stack'.
+    _lock: threading.Lock
+    _local: threading.local
+
+    def __init__(self) -> None:
+        """Initialize an instrumentation with no calls recorded."""
+        self.screen = 'None'
+        self.methods = {}
+        self.screens = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def instrument_client(self, client: Any) -> Any:
+        """Return a wrapper of the firestore <client> that counts the operations made through it.
+        """
+        return _InstrumentedReference(client, self)
+
+    def record(self, operation: str, count: int = 1) -> None:
+        """Record <count> database operations of the given kind, made by the running method call.
+
+        Operations made outside any method call of the handler are not recorded.
+
+        Preconditions:
+            - operation in OPERATIONS
+        """
+        stack = getattr(self._local, 'stack', [])
+
+        if stack:
+            stack[-1][operation] += count
+
+    def measure(self, name: str, function: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Return function(*args, **kwargs), recorded as a call of the method <name>."""
+        stack = self._get_stack()
+        stack.append(dict.fromkeys(OPERATIONS, 0))
+        start = time.perf_counter()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self._add_call(name, stack.pop(), time.perf_counter() - start)
+
+    def measure_iterator(self, name: str, iterator: Iterator) -> Iterator:
+        """Yield the items of <iterator>, recorded as a single call of the method <name>.
+
+        Only the time spent producing the items is measured, not the time the caller spends
+        between them, and the operations made while producing them are counted for the call.
+        """
+        operations = dict.fromkeys(OPERATIONS, 0)
+        seconds = 0.0
+
+        try:
+            while True:
+                stack = self._get_stack()
+                stack.append(dict.fromkeys(OPERATIONS, 0))
+                start = time.perf_counter()
+
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += time.perf_counter() - start
+
+                    for operation, count in stack.pop().items():
+                        operations[operation] += count
+
+                yield item
+        finally:
+            self._add_call(name, operations, seconds)
+
+    def _get_stack(self) -> list[dict[str, int]]:
+        """Return the stack of the running method calls of the current thread."""
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+
+        return self._local.stack
+
+    def _add_call(self, name: str, operations: dict[str, int], seconds: float) -> None:
+        """Record a finished call of the method <name>, which made the given operations and
+        took <seconds> seconds, for the method and for its caller.
+        """
+        stack = self._get_stack()
+
+        with self._lock:
+            self.methods.setdefault(name, CallStats()).add(operations, seconds)
+
+            if stack:
+                for operation in OPERATIONS:
+                    stack[-1][operation] += operations[operation]
+            else:
+                self.screens.setdefault(self.screen, CallStats()).add(operations, seconds)
+
+    def dump(self, file: TextIO = sys.stdout) -> None:
+        """Write a summary of the recorded calls to <file>.
+
+        For each method and each screen the summary shows the number of calls, the operations
+        made, the reads per call (the read amplification), and the median and 95th percentile
+        latency in milliseconds (as the bound of the histogram bucket they fall in).
+        """
+        with self._lock:
+            file.write(Instrumentation._format_table('method', self.methods))
+            file.write('\n')
+            file.write(Instrumentation._format_table('screen', self.screens))
+
+    @staticmethod
+    def _format_table(title: str, stats: dict[str, CallStats]) -> str:
+        """Return the rows of the summary of the given statistics, keyed by <title>."""
+        lines = [f'{title:<28}{"calls":>8}{"reads":>8}{"writes":>8}{"deletes":>8}'
+                 f'{"reads/call":>12}{"p50 ms":>8}{"p95 ms":>8}']
+
+        for name, call_stats in sorted(stats.items()):
+            operations = call_stats.operations
+
+            lines.append(f'{name:<28}{call_stats.calls:>8}{operations["reads"]:>8}'
+                         f'{operations["writes"]:>8}{operations["deletes"]:>8}'
+                         f'{operations["reads"] / call_stats.calls:>12.1f}'
+                         f'{call_stats.latency.get_percentile(50):>8}'
+                         f'{call_stats.latency.get_percentile(95):>8}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def instrumented(method: Callable) -> Callable:
+    """Return the given method of DataHandler, recorded by the handler's instrumentation when it
+    has one.
+
+    A generator method is recorded while its items are produced, see measure_iterator.
+    """
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(self: Any, *args: Any, **kwargs: Any) -> Iterator:
+            if self.instrumentation is None:
+                return method(self, *args, **kwargs)
+
+            return self.instrumentation.measure_iterator(method.__name__,
+                                                         method(self, *args, **kwargs))
+
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        if self.instrumentation is None:
+            return method(self, *args, **kwargs)
+
+        return self.instrumentation.measure(method.__name__, method, self, *args, **kwargs)
+
+    return wrapper
+
+
+class _InstrumentedReference:
+    """A wrapper of a firestore client, reference, query or batch that records the operations
+    made through it.
+
+    A read is counted for each document read, and at least one for each query, as billed by
+    firestore. The operations staged in a batch are counted when they are staged.
+    """
+    # Private Instance Attributes:
+    #     - _wrapped:
+    #         The firestore object wrapped.
+    #     - _instrumentation:
+    #         The instrumentation the operations are recorded by.
+    _wrapped: Any
+    _instrumentation: Instrumentation
+
+    def __init__(self, wrapped: Any, instrumentation: Instrumentation) -> None:
+        self._wrapped = wrapped
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._wrapped, name)
+
+        if not callable(attribute):
+            return attribute
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            # Firestore checks the types of the references it is given, so they are unwrapped
+            args = [_unwrap(arg) for arg in args]
+            kwargs = {key: _unwrap(value) for key, value in kwargs.items()}
+
+            if name in _WRITE_METHODS:
+                self._instrumentation.record('writes')
+            elif name in _DELETE_METHODS:
+                self._instrumentation.record('deletes')
+
+            result = attribute(*args, **kwargs)
+
+            if name in _CHAINED_METHODS:
+                return _InstrumentedReference(result, self._instrumentation)
+            elif name in _READ_METHODS:
+                return self._count_reads(result)
+            else:
+                return result
+
+        return call
+
+    def _count_reads(self, result: Any) -> Any:
+        """Record the reads of the documents in <result>, and return <result>.
+
+        A list is counted immediately, and an iterator as it is consumed.
+        """
+        if isinstance(result, list):
+            self._instrumentation.record('reads', max(1, len(result)))
+            return result
+        elif hasattr(result, '__next__'):
+            return self._count_iterator(result)
+        else:
+            self._instrumentation.record('reads')
+            return result
+
+    def _count_iterator(self, iterator: Iterator) -> Iterator:
+        """Yield the documents of <iterator>, recording a read for each of them."""
+        count = 0
+
+        for document in iterator:
+            count += 1
+            self._instrumentation.record('reads')
+            yield document
+
+        if count == 0:
+            self._instrumentation.record('reads')
+
+
+def _unwrap(value: Any) -> Any:
+    """Return <value> with the firestore objects wrapped by _InstrumentedReference unwrapped,
+    including those in a list or tuple.
+    """
+    if isinstance(value, _InstrumentedReference):
+        return value._wrapped
+    elif isinstance(value, (list, tuple)):
+        return [_unwrap(item) for item in value]
+    else:
+        return value
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing',
+                          'bisect',
+                          'functools',
+                          'inspect',
+                          'sys',
+                          'threading',
+                          'time',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
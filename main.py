@@ -1,12 +1,23 @@
+import os
+
 import screen
 
 from authenticate import DataHandler
+from compact_graph import load_graph_from_snapshot
+import constants
 
 if __name__ == '__main__':
 
     data_handler = DataHandler()
 
+    if os.path.exists(constants.GRAPH_SNAPSHOT):
+        with data_handler.graph_lock:
+            data_handler.graph = load_graph_from_snapshot(constants.GRAPH_SNAPSHOT, data_handler)
+
     current_screen = screen.HomeScreen(data_handler)
 
     while current_screen is not None:
+        if data_handler.instrumentation is not None:
+            data_handler.instrumentation.screen = type(current_screen).__name__
+
         current_screen = current_screen.show()
@@ -0,0 +1,135 @@
+"""File contains the MinHashIndex class, used to find users with similar preferences without
+comparing against every user
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from typing import Any
+from random import Random
+
+# A Mersenne prime larger than any preference bit, used for the universal hash functions
+_PRIME = (1 << 61) - 1
+
+
+class MinHashIndex:
+    """A locality-sensitive hashing index over the MinHash signatures of users' preferences.
+
+    The MinHash signature of a user has bands * rows values. Two users agree on one value with a
+    probability equal to their similarity score (the Jaccard similarity of their preferences),
+    so they land in the same bucket of a band with probability s ** rows, and are candidates of
+    each other with probability 1 - (1 - s ** rows) ** bands. More bands give a higher recall and
+    more rows give fewer (and more similar) candidates.
+
+    Instance Attributes:
+        - bands: the number of bands the signatures are split into
+        - rows: the number of signature values in each band
+
+    Representation Invariants:
+        - self.bands >= 1
+        - self.rows >= 1
+    """
+    bands: int
+    rows: int
+
+    # Private Instance Attributes:
+    #     - _coefficients:
+    #         The (a, b) coefficients of the hash functions x -> (a * x + b) % _PRIME,
+    #         one for each signature value.
+    #     - _hashes:
+    #         The hash of each preference bit under each hash function, computed as
+    #         preference bits are seen.
+    #     - _buckets:
+    #         Maps (band, signature values in that band) to the users in that bucket.
+    #     - _keys:
+    #         Maps each user in this index to the keys of the buckets they are in.
+    _coefficients: list[tuple[int, int]]
+    _hashes: list[list[int]]
+    _buckets: dict[tuple, set]
+    _keys: dict[Any, list[tuple]]
+
+    def __init__(self, bands: int, rows: int, seed: int = 0) -> None:
+        """Initialize an empty index with the given number of bands and rows per band.
+
+        The hash functions are drawn from a random generator seeded with <seed>.
+        """
+        self.bands = bands
+        self.rows = rows
+
+        random = Random(seed)
+        self._coefficients = [(random.randrange(1, _PRIME), random.randrange(_PRIME))
+                              for _ in range(bands * rows)]
+        self._hashes = [[] for _ in range(bands * rows)]
+        self._buckets = {}
+        self._keys = {}
+
+    def add(self, user: Any, preferences: int) -> None:
+        """Add <user>, who likes the preferences set in the bitmask <preferences>, to the index.
+
+        If the user is already in this index, their preferences are replaced.
+        """
+        self.remove(user)
+
+        if preferences == 0:
+            return
+
+        signature = self._get_signature(preferences)
+        keys = [(band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+                for band in range(self.bands)]
+
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(user)
+
+        self._keys[user] = keys
+
+    def remove(self, user: Any) -> None:
+        """Remove <user> from this index. Do nothing if <user> is not in this index."""
+        for key in self._keys.pop(user, []):
+            bucket = self._buckets[key]
+            bucket.discard(user)
+
+            if not bucket:
+                del self._buckets[key]
+
+    def get_candidates(self, user: Any) -> set:
+        """Return the users sharing at least one bucket with <user>, including <user> itself.
+
+        Return an empty set if <user> is not in this index.
+        """
+        candidates = set()
+
+        for key in self._keys.get(user, []):
+            candidates.update(self._buckets[key])
+
+        return candidates
+
+    def _get_signature(self, preferences: int) -> list[int]:
+        """Return the MinHash signature of the preferences set in the bitmask <preferences>.
+
+        Preconditions:
+            - preferences != 0
+        """
+        bits = []
+
+        while preferences:
+            lowest = preferences & -preferences
+            bits.append(lowest.bit_length() - 1)
+            preferences ^= lowest
+
+        if bits[-1] >= len(self._hashes[0]):
+            for (a, b), hashes in zip(self._coefficients, self._hashes):
+                hashes.extend((a * bit + b) % _PRIME for bit in range(len(hashes), bits[-1] + 1))
+
+        return [min(hashes[bit] for bit in bits) for hashes in self._hashes]
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing',
+                          'random'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -0,0 +1,128 @@
+"""File contains the PreferenceMatrix class, a NumPy engine used to score friend recommendations
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import numpy
+
+
+class PreferenceMatrix:
+    """A dense user x preference matrix of a friend recommendation graph.
+
+    Row i of the matrix is the preference vector of users[i]: entry (i, j) is 1 if that user likes
+    the preference whose bit in the preference bitmask is j, and 0 otherwise. The similarity
+    scores of one user against every other user are computed with a single matrix-vector product.
+
+    Instance Attributes:
+        - users: The user items, in the order of the rows of the matrix.
+        - rows: Maps a user item to its row in the matrix.
+        - matrix: The user x preference matrix.
+        - sizes: The number of preferences liked by each user, in row order.
+
+    Representation Invariants:
+        - len(self.users) == len(self.rows) == self.matrix.shape[0] == self.sizes.shape[0]
+        - all(self.rows[self.users[i]] == i for i in range(len(self.users)))
+    """
+    users: list
+    rows: dict[Any, int]
+    matrix: numpy.ndarray
+    sizes: numpy.ndarray
+
+    def __init__(self, users: list, masks: list[int], num_preferences: int) -> None:
+        """Initialize the matrix of the given users from their preference bitmasks.
+
+        Preconditions:
+            - len(users) == len(masks)
+            - all(mask < 2 ** num_preferences for mask in masks)
+        """
+        self.users = users
+        self.rows = {user: row for row, user in enumerate(users)}
+        self.matrix = numpy.zeros((len(users), num_preferences), dtype=numpy.float32)
+
+        # The bitmasks are unpacked 64 bits at a time, so that the shifting is done by NumPy.
+        for start in range(0, num_preferences, 64):
+            width = min(64, num_preferences - start)
+            words = numpy.array([(mask >> start) & 0xFFFFFFFFFFFFFFFF for mask in masks],
+                                dtype=numpy.uint64)
+            shifts = numpy.arange(width, dtype=numpy.uint64)
+            bits = (words[:, None] >> shifts) & numpy.uint64(1)
+            self.matrix[:, start:start + width] = bits
+
+        self.sizes = self.matrix.sum(axis=1)
+
+    def set_preference(self, user: Any, bit: int, value: bool) -> None:
+        """Mark whether <user> likes the preference with the given bit.
+
+        Preconditions:
+            - user in self.rows
+            - 0 <= bit < self.matrix.shape[1]
+        """
+        row = self.rows[user]
+        old = self.matrix[row, bit]
+        new = 1.0 if value else 0.0
+
+        self.matrix[row, bit] = new
+        self.sizes[row] += new - old
+
+    def scores(self, user: Any) -> numpy.ndarray:
+        """Return the similarity scores between <user> and every user, in row order.
+
+        Preconditions:
+            - user in self.rows
+        """
+        row = self.rows[user]
+
+        common = (self.matrix @ self.matrix[row]).astype(numpy.float64)
+        total = self.sizes.astype(numpy.float64) + self.sizes[row] - common
+
+        scores = numpy.zeros(len(self.users), dtype=numpy.float64)
+        numpy.divide(common, total, out=scores, where=total != 0)
+
+        return scores
+
+    def top(self, user: Any, limit: int, excluded: set) -> list[tuple[float, Any]]:
+        """Return up to <limit> (score, user) pairs of the users most similar to <user>.
+
+        The pairs are sorted in the same order as a descending sort of all the pairs would
+        give, so ties in score are broken by the user item. Users in <excluded> and users with a
+        similarity score of 0 are left out.
+
+        Preconditions:
+            - user in self.rows
+            - limit >= 1
+        """
+        scores = self.scores(user)
+
+        for item in excluded:
+            if item in self.rows:
+                scores[self.rows[item]] = 0
+
+        candidates = numpy.flatnonzero(scores)
+
+        if len(candidates) > limit:
+            kth = numpy.argpartition(-scores[candidates], limit - 1)[limit - 1]
+            threshold = scores[candidates[kth]]
+
+            # Every user tied with the last score is kept so that ties are broken exactly
+            # as the pure-Python path breaks them.
+            candidates = candidates[scores[candidates] >= threshold]
+
+        top = [(float(scores[row]), self.users[row]) for row in candidates]
+        top.sort(reverse=True)
+
+        return top[:limit]
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing',
+                          'numpy'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
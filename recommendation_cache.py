@@ -0,0 +1,112 @@
+"""File contains the RecommendationCache class, used to serve recently computed friend
+recommendations again without scoring the users a second time
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class RecommendationCache:
+    """A bounded cache of friend recommendations that evicts the least recently used entry.
+
+    Each entry is keyed by a tuple whose first item is the user the recommendations were made
+    for, and whose second item is the version of the graph they were computed on. Entries of
+    older versions are never hit again, and are evicted once they become the least recently used.
+
+    Instance Attributes:
+        - capacity: the maximum number of entries kept
+        - hits: the number of lookups that found an entry
+        - misses: the number of lookups that did not find an entry
+        - evictions: the number of entries evicted to make room for a new one
+        - invalidations: the number of entries removed because they may have become stale
+
+    Representation Invariants:
+        - self.capacity >= 1
+        - self.hits >= 0 and self.misses >= 0
+        - self.evictions >= 0 and self.invalidations >= 0
+    """
+    capacity: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+    # Private Instance Attributes:
+    #     - _entries:
+    #         Maps a key to its cached value, from the least to the most recently used.
+    _entries: OrderedDict[tuple, Any]
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize an empty cache holding up to <capacity> entries.
+
+        Preconditions:
+            - capacity >= 1
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of entries in this cache."""
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Any:
+        """Return the value cached for <key> and mark it as the most recently used.
+
+        Return None if there is no entry for <key>.
+        """
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, value: Any) -> None:
+        """Cache <value> for <key>, evicting the least recently used entry if this cache is full.
+
+        Preconditions:
+            - value is not None
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, is_stale: Callable[[Any], bool]) -> None:
+        """Remove every entry made for a user for whom <is_stale> returns True."""
+        stale = [key for key in self._entries if is_stale(key[0])]
+
+        for key in stale:
+            del self._entries[key]
+
+        self.invalidations += len(stale)
+
+    def get_stats(self) -> dict[str, int]:
+        """Return the counters of this cache and its current size."""
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._entries)}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['collections',
+                          'typing'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
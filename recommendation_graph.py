@@ -4,10 +4,11 @@ By Eeshan Narula and Avnish Pasari
 """
 from __future__ import annotations
 
-from typing import Any
-from random import choice
+from typing import Any, Iterator, Optional
 
+import heapq
 import logging
+import time
 import webbrowser
 
 import dash
@@ -19,6 +20,60 @@ from dash.dependencies import Input, Output
 from authenticate import DataHandler
 import constants
 
+from minhash import MinHashIndex
+from recommendation_cache import RecommendationCache
+
+try:
+    from preference_matrix import PreferenceMatrix
+except ImportError:
+    PreferenceMatrix = None
+
+
+# Maps every preference in constants.CATEGORIES to its category
+PREFERENCE_CATEGORIES = {preference: category
+                         for category in constants.CATEGORIES
+                         for preference in constants.CATEGORIES[category]}
+
+# The number of bits set in each byte, used to count the bits of a bitmask before Python 3.10
+_BYTE_BIT_COUNTS = bytes(bin(byte).count('1') for byte in range(256))
+
+
+def _count_bits_by_byte(mask: int) -> int:
+    """Return the number of bits set in <mask>, looking up one byte of it at a time.
+
+    Preconditions:
+        - mask >= 0
+    """
+    count = 0
+
+    while mask:
+        count += _BYTE_BIT_COUNTS[mask & 0xff]
+        mask >>= 8
+
+    return count
+
+
+# Return the number of bits set in a bitmask, with int.bit_count where it exists (Python 3.10+)
+count_bits = getattr(int, 'bit_count', _count_bits_by_byte)
+
+
+def format_match(score: float, user: str) -> str:
+    """Return the string used to show <user> as a recommendation with the given similarity score
+
+    >>> format_match(0.5, 'alice')
+    'alice (50% match)'
+    """
+    return user + f' ({round(score * 100)}% match)'
+
+
+def format_mutual_friends(count: int, user: str) -> str:
+    """Return the string used to show <user> as a recommendation with <count> mutual friends
+
+    >>> format_mutual_friends(2, 'alice')
+    'alice (2 mutual friends)'
+    """
+    return user + f' ({count} mutual friend{"" if count == 1 else "s"})'
+
 
 class _Vertex:
     """A vertex in a friend recommendation graph, is used to represent a user or a preference.
@@ -30,11 +85,17 @@ class _Vertex:
         - item: The data stored in this vertex, representing a user or preference.
         - kind: The type of this vertex: 'user' or 'preference'.
         - neighbours: The vertices that are adjacent to this vertex.
+        - bit: The position of this preference in the preference bitmask of a user
+          (-1 for a user vertex).
+        - preferences: A bitmask of the preferences liked by this user, where bit i is set
+          if and only if this user is adjacent to the preference whose bit is i
+          (0 for a preference vertex).
 
     Representation Invariants:
         - self not in self.neighbours
         - all(self in u.neighbours for u in self.neighbours)
         - self.kind in {'user', 'preference'}
+        - self.kind == 'user' or self.preferences == 0
 
     The base class was take from the A3 with the following methods:
     - degree (same)
@@ -46,6 +107,8 @@ class _Vertex:
     item: Any
     kind: str
     neighbours: set[_Vertex]
+    bit: int
+    preferences: int
 
     def __init__(self, item: Any, kind: str) -> None:
         """Initialize a new vertex with the given item and kind.
@@ -58,6 +121,8 @@ class _Vertex:
         self.item = item
         self.kind = kind
         self.neighbours = set()
+        self.bit = -1
+        self.preferences = 0
 
     def degree(self) -> int:
         """Return the degree of this vertex."""
@@ -65,63 +130,17 @@ class _Vertex:
 
     def similarity_score(self, other: _Vertex) -> float:
         """Return the similarity score between this vertex and other.
-        """
-        if self.degree() != 0 and other.degree() != 0:
-            common_neighbours = {neighbour for neighbour in
-                                 self.neighbours.intersection(other.neighbours)
-                                 if neighbour.kind == 'preference'}
 
-            all_neighbours = {neighbour for neighbour in
-                              self.neighbours.union(other.neighbours)
-                              if neighbour.kind == 'preference'}
-
-            numerator = len(common_neighbours)
-            denominator = len(all_neighbours)
+        The score is the number of preferences both users like divided by the number of
+        preferences liked by either of them, computed on the preference bitmasks.
+        """
+        denominator = count_bits(self.preferences | other.preferences)
 
-            return numerator / denominator
+        if denominator != 0:
+            return count_bits(self.preferences & other.preferences) / denominator
         else:
             return 0
 
-    def generate_graph(self, d: int, visited: set[_Vertex]) -> set[_Vertex]:
-        """ Return set of all vertices until depth d
-
-        :param visited: the set of already visited vertices
-        :param d: the depth
-
-        Precondition:
-        - d >= 0
-        """
-        if d == 0:
-            visited.add(self)
-            return visited
-        else:
-            visited.add(self)
-
-            for neighbour in self.neighbours:
-                if neighbour.kind == 'user' and neighbour not in visited:
-                    visited = visited.union(neighbour.generate_graph(d - 1, visited))
-
-            return visited
-
-    def format_for_graph(self, visited: set[_Vertex]) -> list[dict]:
-        """ Return formatted data for visualization
-
-        the formatting is done for the dash library to plot a graph
-
-        :param visited: a set of already visited vertices
-        """
-
-        networks = [{'data': {'id': self.item, 'label': self.item}}]
-
-        visited.add(self)
-
-        for neighbour in self.neighbours:
-            if neighbour not in visited:
-                networks.extend(neighbour.format_for_graph(visited))
-                networks.append({'data': {'source': self.item, 'target': neighbour.item}})
-
-        return networks
-
 
 class Graph:
     """A graph used to represent a friend recommendation network.
@@ -140,11 +159,45 @@ class Graph:
     #     - _vertices:
     #         A collection of the vertices contained in this graph.
     #         Maps item to _Vertex object.
+    #     - _preferences:
+    #         The preference vertices of this graph, indexed by their bit in a
+    #         user's preference bitmask. The bit of a removed preference is never
+    #         reused, and its entry is None.
+    #     - _categories:
+    #         The category of each preference vertex that is not in constants.CATEGORIES,
+    #         taken from the data of the first user who liked it.
+    #     - _matrix:
+    #         The user x preference matrix used by the 'numpy' recommendation engine,
+    #         or None if it has to be rebuilt before its next use.
+    #     - _minhash:
+    #         The MinHash index used by the 'minhash' recommendation engine, or None if
+    #         it has not been enabled.
+    #     - _cache:
+    #         The rankings recently computed by recommend_friends, keyed by
+    #         (user, _version, engine), each with whether it holds every match.
+    #     - _version:
+    #         The version of this graph, increased by the changes whose effect on the
+    #         cached recommendations is not tracked user by user.
     _vertices: dict[Any, _Vertex]
+    _preferences: list[Optional[_Vertex]]
+    _categories: dict[Any, str]
+    _matrix: Optional[PreferenceMatrix]
+    _minhash: Optional[MinHashIndex]
+    _cache: RecommendationCache
+    _version: int
+
+    def __init__(self, cache_size: int = constants.RECOMMENDATION_CACHE_SIZE) -> None:
+        """Initialize an empty graph (no vertices or edges).
 
-    def __init__(self) -> None:
-        """Initialize an empty graph (no vertices or edges)."""
+        Up to <cache_size> rankings of recommendations are cached by recommend_friends.
+        """
         self._vertices = {}
+        self._preferences = []
+        self._categories = {}
+        self._matrix = None
+        self._minhash = None
+        self._cache = RecommendationCache(cache_size)
+        self._version = 0
 
     def add_vertex(self, item: Any, kind: str) -> None:
         """Add a vertex with the given item and kind to this graph.
@@ -152,11 +205,20 @@ class Graph:
         The new vertex is not adjacent to any other vertices.
         Do nothing if the given item is already in this graph.
 
+        A new preference is given the next free bit in the users' preference bitmasks.
+
         Preconditions:
             - kind in {'user', 'preference'}
         """
         if item not in self._vertices:
-            self._vertices[item] = _Vertex(item, kind)
+            vertex = _Vertex(item, kind)
+
+            if kind == 'preference':
+                vertex.bit = len(self._preferences)
+                self._preferences.append(vertex)
+
+            self._vertices[item] = vertex
+            self._matrix = None
 
     def add_edge(self, item1: Any, item2: Any) -> None:
         """Add an edge between the two vertices with the given items in this graph.
@@ -172,9 +234,271 @@ class Graph:
 
             v1.neighbours.add(v2)
             v2.neighbours.add(v1)
+
+            if v1.kind == 'user' and v2.kind == 'preference':
+                self._add_preference(v1, v2)
+            elif v1.kind == 'preference' and v2.kind == 'user':
+                self._add_preference(v2, v1)
+            elif v1.kind == 'user' and v2.kind == 'user':
+                self._invalidate_friends(v1, v2)
+        else:
+            raise ValueError
+
+    def remove_edge(self, item1: Any, item2: Any) -> None:
+        """Remove the edge between the two vertices with the given items in this graph.
+
+        Do nothing if the two vertices are not adjacent.
+        Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
+        """
+        if item1 in self._vertices and item2 in self._vertices:
+            v1 = self._vertices[item1]
+            v2 = self._vertices[item2]
+
+            v1.neighbours.discard(v2)
+            v2.neighbours.discard(v1)
+
+            if v1.kind == 'user' and v2.kind == 'preference':
+                self._remove_preference(v1, v2)
+            elif v1.kind == 'preference' and v2.kind == 'user':
+                self._remove_preference(v2, v1)
+            elif v1.kind == 'user' and v2.kind == 'user':
+                self._invalidate_friends(v1, v2)
         else:
             raise ValueError
 
+    def remove_vertex(self, item: Any) -> None:
+        """Remove the vertex with the given item, and all of its edges, from this graph.
+
+        Raise a ValueError if item does not appear as a vertex in this graph.
+        """
+        if item in self._vertices:
+            vertex = self._vertices[item]
+
+            for neighbour in list(vertex.neighbours):
+                self.remove_edge(item, neighbour.item)
+
+            if vertex.kind == 'preference':
+                self._preferences[vertex.bit] = None
+                self._categories.pop(item, None)
+            else:
+                self._cache.invalidate(lambda user: user == item)
+
+                if self._minhash is not None:
+                    self._minhash.remove(item)
+
+            del self._vertices[item]
+            self._matrix = None
+        else:
+            raise ValueError
+
+    def add_user(self, user_data: dict) -> None:
+        """Add the user with the given data, its preferences and its friendships to this graph.
+
+        Friends that do not appear as vertices in this graph are ignored, and preferences that
+        do not appear are added.
+
+        :param user_data: the data of the user as stored in the firebase database
+        """
+        self.update_user(user_data['userID'], user_data)
+
+    def remove_user(self, user_id: str) -> None:
+        """Remove the given user and all of its edges from this graph.
+
+        Do nothing if user_id does not appear as a vertex in this graph.
+
+        :param user_id: the user ID of the user
+        """
+        if user_id in self._vertices:
+            self.remove_vertex(user_id)
+
+    def update_user(self, user_id: str, user_data: dict) -> None:
+        """Update the edges of the given user to match the (possibly partial) user data.
+
+        Only the preference categories and friends present in <user_data> are changed, and only
+        the edges that differ are added or removed. The user is added to this graph if it does
+        not appear in it, e.g. when it was registered after this graph was loaded.
+
+        The old preferences of a category are found among the preference neighbours of the
+        user, so that preferences not in constants.CATEGORIES (or of unknown category) are
+        removed too.
+
+        :param user_id: the user ID of the user
+        :param user_data: the data of the user, as written to the firebase database
+        """
+        self.add_vertex(user_id, 'user')
+
+        vertex = self._vertices[user_id]
+
+        old_items = set()
+        new_items = set()
+
+        for category in constants.CATEGORIES:
+            if category in user_data:
+                old_items.update(neighbour.item for neighbour in vertex.neighbours
+                                 if neighbour.kind == 'preference'
+                                 and self._get_category(neighbour.item) in {category, None})
+                new_items.update(user_data[category])
+                self._add_categories(user_data[category], category)
+
+        if 'friends' in user_data:
+            old_items.update(neighbour.item for neighbour in vertex.neighbours
+                             if neighbour.kind == 'user')
+            new_items.update(friend for friend in user_data['friends']
+                             if friend in self._vertices and friend != user_id)
+
+        for item in old_items - new_items:
+            self.remove_edge(user_id, item)
+
+        for item in new_items - old_items:
+            self.add_vertex(item, 'preference')
+            self.add_edge(user_id, item)
+
+    def _get_category(self, preference: Any) -> Optional[str]:
+        """Return the category of <preference>, or None if it is not known."""
+        return PREFERENCE_CATEGORIES.get(preference, self._categories.get(preference))
+
+    def _add_categories(self, preferences: list, category: str) -> None:
+        """Record <category> as the category of each of <preferences> whose category is not
+        already known.
+        """
+        for preference in preferences:
+            if self._get_category(preference) is None:
+                self._categories[preference] = category
+
+    def _add_preference(self, user: _Vertex, preference: _Vertex) -> None:
+        """Set the bit of <preference> in the preference bitmask of <user>."""
+        user.preferences |= 1 << preference.bit
+
+        if self._matrix is not None:
+            self._matrix.set_preference(user.item, preference.bit, True)
+
+        if self._minhash is not None:
+            self._minhash.add(user.item, user.preferences)
+
+        self._invalidate_preferences(user, user.preferences)
+
+    def _remove_preference(self, user: _Vertex, preference: _Vertex) -> None:
+        """Clear the bit of <preference> in the preference bitmask of <user>."""
+        self._invalidate_preferences(user, user.preferences)
+
+        user.preferences &= ~(1 << preference.bit)
+
+        if self._matrix is not None:
+            self._matrix.set_preference(user.item, preference.bit, False)
+
+        if self._minhash is not None:
+            self._minhash.add(user.item, user.preferences)
+
+    def _invalidate_preferences(self, user: _Vertex, preferences: int) -> None:
+        """Evict the cached recommendations that a change of the preferences of <user> can
+        affect, where <preferences> is the bitmask of the preferences of <user> before or after
+        the change, whichever has more bits set.
+
+        Those are the recommendations made for <user>, and those made for any user sharing one of
+        these preferences: their similarity score with <user> has changed, so <user> may enter,
+        leave or move within their recommendations. The scores of any other user with <user> are
+        0 both before and after the change.
+        """
+        if len(self._cache) > 0:
+            self._cache.invalidate(lambda other: other == user.item or (
+                other in self._vertices and self._vertices[other].preferences & preferences != 0))
+
+    def _invalidate_friends(self, user1: _Vertex, user2: _Vertex) -> None:
+        """Evict the cached recommendations of two users who became or stopped being friends.
+
+        Friends are never recommended to each other, so no other user is affected.
+        """
+        if len(self._cache) > 0:
+            self._cache.invalidate(lambda other: other in {user1.item, user2.item})
+
+    def _get_candidates(self, user: _Vertex) -> set[_Vertex]:
+        """Return the users who like at least one of the preferences liked by <user>.
+
+        These are the only users that can have a non-zero similarity score with <user>. The
+        neighbours of a preference vertex are exactly the users who like it, so the preference
+        vertices indexed by bit act as an inverted index from preference to users.
+        """
+        candidates = set()
+        mask = user.preferences
+
+        while mask:
+            lowest = mask & -mask
+            candidates.update(self._preferences[lowest.bit_length() - 1].neighbours)
+            mask ^= lowest
+
+        return candidates
+
+    def enable_minhash(self, bands: int = constants.MINHASH_BANDS,
+                       rows: int = constants.MINHASH_ROWS, seed: int = 0) -> None:
+        """Build the MinHash index used by the 'minhash' recommendation engine.
+
+        The index is kept up to date as the graph changes. More bands give a higher recall,
+        more rows give fewer candidates to score (a lower latency). Calling this again rebuilds
+        the index with the new parameters.
+        """
+        self._minhash = MinHashIndex(bands, rows, seed)
+        self._version += 1
+
+        for vertex in self._vertices.values():
+            if vertex.kind == 'user':
+                self._minhash.add(vertex.item, vertex.preferences)
+
+    def measure_minhash_recall(self, users: list[str], limit: int) -> dict[str, float]:
+        """Return how the 'minhash' engine compares to the exact 'python' engine on <users>.
+
+        The returned dictionary maps:
+            - 'recall' to the average fraction of the exact top <limit> users found by the
+              'minhash' engine (a user tied with the last exact score counts as found)
+            - 'candidates' to the average number of candidates scored by the 'minhash' engine
+            - 'exact_seconds' and 'minhash_seconds' to the average time of one request
+
+        Preconditions:
+            - users != []
+            - all(user in self.get_all_vertices('user') for user in users)
+            - limit >= 1
+        """
+        if self._minhash is None:
+            self.enable_minhash()
+
+        recall = candidates = exact_seconds = minhash_seconds = 0.0
+
+        for user in users:
+            start = time.perf_counter()
+            exact = self.get_top_matches(user, limit, engine='python')
+            exact_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            approximate = self.get_top_matches(user, limit, engine='minhash')
+            minhash_seconds += time.perf_counter() - start
+
+            candidates += len(self._minhash.get_candidates(user))
+
+            if exact == []:
+                recall += 1
+            else:
+                found = sum(1 for score, _ in approximate if score >= exact[-1][0])
+                recall += found / len(exact)
+
+        return {'recall': recall / len(users),
+                'candidates': candidates / len(users),
+                'exact_seconds': exact_seconds / len(users),
+                'minhash_seconds': minhash_seconds / len(users)}
+
+    def _get_matrix(self) -> PreferenceMatrix:
+        """Return the user x preference matrix of this graph, building it if needed.
+
+        Preconditions:
+            - PreferenceMatrix is not None
+        """
+        if self._matrix is None:
+            users = [v for v in self._vertices.values() if v.kind == 'user']
+
+            self._matrix = PreferenceMatrix([v.item for v in users],
+                                            [v.preferences for v in users],
+                                            len(self._preferences))
+
+        return self._matrix
+
     def adjacent(self, item1: Any, item2: Any) -> bool:
         """Return whether item1 and item2 are adjacent vertices in this graph.
 
@@ -186,16 +510,24 @@ class Graph:
         else:
             return False
 
-    def get_neighbours(self, item: Any) -> set:
+    def get_neighbours(self, item: Any, kind: str = '') -> set:
         """Return a set of the neighbours of the given item.
 
         Note that the *items* are returned, not the _Vertex objects themselves.
+        If kind != '', only return the neighbours of the given vertex kind.
 
         Raise a ValueError if item does not appear as a vertex in this graph.
+
+        Preconditions:
+            - kind in {'', 'user', 'preference'}
         """
         if item in self._vertices:
             v = self._vertices[item]
-            return {neighbour.item for neighbour in v.neighbours}
+
+            if kind != '':
+                return {neighbour.item for neighbour in v.neighbours if neighbour.kind == kind}
+            else:
+                return {neighbour.item for neighbour in v.neighbours}
         else:
             raise ValueError
 
@@ -225,10 +557,12 @@ class Graph:
         else:
             raise ValueError
 
-    def recommend_friends(self, user: str, limit: int) -> list[str]:
+    def recommend_friends(self, user: str, limit: int, offset: int = 0,
+                          engine: Optional[str] = None) -> list[str]:
         """Return a list of up to <limit> recommended friends based on similarity to the given user.
 
         The return value is a list of users, sorted in *descending order* of similarity score.
+        Each user is followed by their similarity score, e.g. 'user (50% match)'.
 
         The returned list should NOT contain:
             - the input user itself
@@ -240,66 +574,303 @@ class Graph:
         then the second-highest similarity score, etc. Fewer than <limit> users are returned if
         and only if there aren't enough users that meet the above criteria.
 
+        The first <offset> users are skipped, so that the recommendations can be shown a page at
+        a time: recommend_friends(user, 10, 10) returns the second page of 10 users.
+
+        <engine> is either 'python', which scores the users one at a time, or 'numpy', which
+        scores all of them at once on the user x preference matrix. Both give the same result.
+        If engine is None, constants.RECOMMENDATION_ENGINE is used, and the 'python' engine is
+        used whenever NumPy is not installed.
+
+        The ranking of the user is scored once, at least constants.RECOMMENDATION_RANKING_DEPTH
+        users deep, and cached, so that the next pages are sliced from it instead of scoring the
+        users again. A page beyond the cached ranking scores a ranking twice as deep. The most
+        recently used rankings are only evicted when the graph changes in a way that can affect
+        them (see _invalidate_preferences and _invalidate_friends).
+
+        <engine> can also be 'minhash', which only scores the users sharing a bucket with the
+        given user in the MinHash index (see enable_minhash). It is approximate: some of the
+        users the other engines return may be missing, and the list may be shorter.
+
         Preconditions:
             - user in self._vertices
             - self._vertices[user].kind == 'user'
             - limit >= 1
+            - offset >= 0
+            - engine in {None, 'python', 'numpy', 'minhash'}
+        """
+        if engine is None:
+            engine = constants.RECOMMENDATION_ENGINE
+
+        # Building the index changes _version, so it is built before the key is made
+        if engine == 'minhash' and self._minhash is None:
+            self.enable_minhash()
+
+        key = (user, self._version, engine)
+        ranking = self._cache.get(key)
+
+        # A ranking shorter than its depth holds every user with a non-zero score
+        if ranking is None or (not ranking[1] and len(ranking[0]) < offset + limit):
+            depth = max(offset + limit, constants.RECOMMENDATION_RANKING_DEPTH,
+                        2 * len(ranking[0]) if ranking is not None else 0)
+            matches = self.get_top_matches(user, depth, 0, engine)
+            ranking = (matches, len(matches) < depth)
+            self._cache.put(key, ranking)
+
+        return [format_match(score, other) for score, other in ranking[0][offset:offset + limit]]
+
+    def get_cache_stats(self) -> dict[str, int]:
+        """Return the hit, miss, eviction and invalidation counters of the cache used by
+        recommend_friends, and its current size.
         """
-        users = []
+        return self._cache.get_stats()
+
+    def get_top_matches(self, user: str, limit: int, offset: int = 0,
+                        engine: Optional[str] = None) -> list[tuple[float, str]]:
+        """Return the (similarity score, user) pairs of the users recommended to the given user.
+
+        The pairs are those of the users returned by self.recommend_friends with the same
+        arguments, in the same order. Only offset + limit pairs are kept in memory while the
+        users are scored.
+
+        Preconditions:
+            - user in self._vertices
+            - self._vertices[user].kind == 'user'
+            - limit >= 1
+            - offset >= 0
+            - engine in {None, 'python', 'numpy', 'minhash'}
+        """
+        if engine is None:
+            engine = constants.RECOMMENDATION_ENGINE
 
         user_vertex = self._vertices[user]
 
-        for vertex in self._vertices:
+        if engine == 'numpy' and PreferenceMatrix is not None:
+            excluded = {neighbour.item for neighbour in user_vertex.neighbours}
+            excluded.add(user)
+
+            return self._get_matrix().top(user, offset + limit, excluded)[offset:]
+
+        if engine == 'minhash':
+            if self._minhash is None:
+                self.enable_minhash()
+
+            candidates = {self._vertices[item] for item in self._minhash.get_candidates(user)}
+        else:
+            candidates = self._get_candidates(user_vertex)
+
+        scores = ((user_vertex.similarity_score(other_vertex), other_vertex.item)
+                  for other_vertex in candidates
+                  if other_vertex is not user_vertex
+                  and other_vertex not in user_vertex.neighbours)
+
+        top = heapq.nlargest(offset + limit, (pair for pair in scores if pair[0] != 0))
 
-            other_vertex = self._vertices[vertex]
+        return top[offset:]
+
+    def recommend_friends_of_friends(self, user: str, limit: int, offset: int = 0,
+                                     blend: float = 0.0) -> list[str]:
+        """Return a list of up to <limit> recommended friends based on the friends they share with
+        the given user.
+
+        The return value is a list of users who are not friends of the given user but are friends
+        of at least one of their friends, sorted in *descending order* of score. Each user is
+        followed by the number of mutual friends, e.g. 'user (2 mutual friends)'.
+
+        See get_mutual_friend_matches for the score, and recommend_friends for <offset>.
+
+        Preconditions:
+            - user in self._vertices
+            - self._vertices[user].kind == 'user'
+            - limit >= 1
+            - offset >= 0
+            - 0.0 <= blend <= 1.0
+        """
+        return [format_mutual_friends(count, other) for _, count, other in
+                self.get_mutual_friend_matches(user, limit, offset, blend)]
+
+    def get_mutual_friend_matches(self, user: str, limit: int, offset: int = 0,
+                                  blend: float = 0.0,
+                                  max_degree: int = constants.MAX_MUTUAL_FRIEND_DEGREE) \
+            -> list[tuple[float, int, str]]:
+        """Return the (score, mutual friends, user) triples of the users recommended to the given
+        user by recommend_friends_of_friends, in the same order.
+
+        The users are found through a two-hop search from the given user. The score of a user is
+        (1 - blend) * (the fraction of the given user's friends who are their friends) +
+        blend * (their similarity score with the given user), so a blend of 0 ranks by mutual
+        friends only and a blend of 1 by shared preferences only.
+
+        Friends of the given user with more than <max_degree> friends are not searched through, so
+        that a few very popular friends do not make the search explode. Their friends are still
+        found through the given user's other friends.
+
+        Preconditions:
+            - user in self._vertices
+            - self._vertices[user].kind == 'user'
+            - limit >= 1
+            - offset >= 0
+            - 0.0 <= blend <= 1.0
+        """
+        user_vertex = self._vertices[user]
+        friends = [neighbour for neighbour in user_vertex.neighbours if neighbour.kind == 'user']
 
-            if other_vertex.kind == 'user' and \
-                    vertex != user and \
-                    other_vertex not in user_vertex.neighbours:
+        mutual_friends = {}
 
-                score = user_vertex.similarity_score(other_vertex)
+        for friend in friends:
+            # Only the friends count towards the degree, like in CompactGraph
+            friends_of_friend = [other_vertex for other_vertex in friend.neighbours
+                                 if other_vertex.kind == 'user']
 
-                if score != 0:
-                    users.append((score, vertex))
+            if len(friends_of_friend) <= max_degree:
+                for other_vertex in friends_of_friend:
+                    if other_vertex is not user_vertex and \
+                            other_vertex not in user_vertex.neighbours:
+                        mutual_friends[other_vertex] = mutual_friends.get(other_vertex, 0) + 1
 
-        users.sort(reverse=True)
+        scores = (((1 - blend) * count / len(friends) +
+                   blend * user_vertex.similarity_score(other_vertex), count, other_vertex.item)
+                  for other_vertex, count in mutual_friends.items())
 
-        return [user_data[1] + f' ({round(user_data[0] * 100)}% match)'
-                for user_data in users][:limit]
+        return heapq.nlargest(offset + limit, scores)[offset:]
 
-    def generate_users_graph_for_user(self, user: str, d: int) -> Graph:
+    def generate_users_graph_for_user(self, user: str, d: int,
+                                      max_vertices: Optional[int] = None) -> Graph:
         """ Return a graph of a users and their friends until depth d
 
+        If max_vertices is not None, at most max_vertices users are kept, closest first.
+
         :param user: the user ID of the user
         :param d: the depth
+        :param max_vertices: the maximum number of users in the returned graph
+        """
+        distances = self.get_ego_network(user, d, max_vertices)
+
+        graph = Graph()
+
+        for item in distances:
+            graph.add_vertex(item, 'user')
+
+        for item in distances:
+            for neighbour in self._vertices[item].neighbours:
+                if neighbour.item in distances:
+                    graph.add_edge(item, neighbour.item)
+
+        return graph
+
+    def get_ego_network(self, user: str, d: int,
+                        max_vertices: Optional[int] = None) -> dict[Any, int]:
+        """Return the users at most d friendships away from the given user, mapped to their
+        distance (the number of friendships between them and the given user).
+
+        The users are found level by level, so that every user is reached by a shortest path.
+        If max_vertices is not None, the search stops once max_vertices users are found.
+
+        Raise a ValueError if user does not appear as a vertex in this graph.
+
+        Preconditions:
+            - d >= 0
+            - max_vertices is None or max_vertices >= 1
         """
         if user not in self._vertices:
             raise ValueError
 
-        vertices = self._vertices[user].generate_graph(d, set())
+        distances = {user: 0}
+        frontier = [self._vertices[user]]
 
-        graph = Graph()
+        for distance in range(1, d + 1):
+            next_frontier = []
 
-        for vertex in vertices:
-            graph.add_vertex(vertex.item, vertex.kind)
+            for vertex in frontier:
+                for neighbour in vertex.neighbours:
+                    if neighbour.kind == 'user' and neighbour.item not in distances:
+                        if max_vertices is not None and len(distances) >= max_vertices:
+                            return distances
 
-        for vertex in vertices:
-            for neighbour in vertex.neighbours:
-                if neighbour.item in graph._vertices:
-                    graph.add_edge(vertex.item, neighbour.item)
+                        distances[neighbour.item] = distance
+                        next_frontier.append(neighbour)
 
-        return graph
+            frontier = next_frontier
+
+        return distances
 
-    def format_for_graph(self) -> list[dict]:
+    def format_for_graph(self, max_elements: Optional[int] = None,
+                         root: Optional[Any] = None) -> list[dict]:
         """ Return formatted data for visualization
+
+        See iter_elements for the meaning of max_elements and root.
         """
-        vertex = self._vertices[choice(list(self._vertices.keys()))]
-        return vertex.format_for_graph(set())
+        return list(self.iter_elements(max_elements, root))
+
+    def iter_elements(self, max_elements: Optional[int] = None,
+                      root: Optional[Any] = None) -> Iterator[dict]:
+        """ Yield the node and edge elements of this graph, formatted for the dash library
+
+        Every vertex of every connected component is yielded as a node, and every edge is
+        yielded exactly once, after the nodes it connects.
+
+        If max_elements is not None, at most max_elements elements are yielded, keeping the
+        vertices closest to <root> first if root is not None, and the vertices of highest degree
+        first otherwise.
 
-    def plot(self) -> None:
+        Preconditions:
+            - max_elements is None or max_elements >= 0
+            - root is None or root in self.get_all_vertices()
+        """
+        if max_elements is None:
+            order = iter(self._vertices.values())
+        elif root is not None:
+            order = self._iter_breadth_first(self._vertices[root])
+        else:
+            order = iter(sorted(self._vertices.values(), key=_Vertex.degree, reverse=True))
+
+        yielded = set()
+        count = 0
+
+        for vertex in order:
+            if max_elements is not None and count >= max_elements:
+                return
+
+            yield {'data': {'id': vertex.item, 'label': vertex.item}}
+            count += 1
+
+            yielded.add(vertex)
+
+            for neighbour in vertex.neighbours:
+                if neighbour in yielded and neighbour is not vertex:
+                    if max_elements is not None and count >= max_elements:
+                        return
+
+                    yield {'data': {'source': neighbour.item, 'target': vertex.item}}
+                    count += 1
+
+    @staticmethod
+    def _iter_breadth_first(root: _Vertex) -> Iterator[_Vertex]:
+        """ Yield the vertices of the connected component of root, closest to root first
+        """
+        visited = {root}
+        frontier = [root]
+
+        while frontier:
+            yield from frontier
+
+            next_frontier = []
+
+            for vertex in frontier:
+                for neighbour in vertex.neighbours:
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        next_frontier.append(neighbour)
+
+            frontier = next_frontier
+
+    def plot(self, max_elements: Optional[int] = constants.MAX_PLOT_ELEMENTS,
+             root: Optional[Any] = None) -> None:
         """ Plot the graph in dash
+
+        At most max_elements nodes and edges are sent to the browser, see iter_elements.
         """
-        graph_data = self.format_for_graph()
+        graph_data = self.format_for_graph(max_elements, root)
 
         app = dash.Dash(__name__)
 
@@ -337,6 +908,20 @@ class Graph:
         webbrowser.open_new('http://127.0.0.1:5050/')
         app.run_server(port=5050)
 
+    @staticmethod
+    def get_friends_graph(handler: DataHandler) -> Graph:
+        """Return the friend recommendation graph kept up to date by the handler
+
+        The graph is loaded with Graph.load_friends_graph the first time, and afterwards the
+        handler patches it in place whenever it changes the firebase data. The graph should only
+        be used while handler.graph_lock is held.
+        """
+        with handler.graph_lock:
+            if handler.graph is None:
+                handler.graph = Graph.load_friends_graph(handler)
+
+            return handler.graph
+
     @staticmethod
     def load_friends_graph(handler: DataHandler) -> Graph:
         """Return a friend recommendation graph from firebase could data using a handler
@@ -344,6 +929,9 @@ class Graph:
         The friend recommendation graph stores one vertex for each user and preference in the
         firebase data. Each vertex stores as its item either a user ID or a preference. Edges
         represent a liking of a preference by a user.
+
+        The users are streamed from the handler with only the fields the graph uses, and are
+        not kept after they are added.
         """
         graph = Graph()
 
@@ -351,27 +939,27 @@ class Graph:
             for preference in constants.CATEGORIES[category]:
                 graph.add_vertex(preference, 'preference')
 
-        users = handler.get_all_data()
+        # The friendships with users who have not been added yet
+        pending = []
 
-        for user in users:
+        for user in handler.iter_all_data(constants.GRAPH_FIELDS):
             graph.add_vertex(user['userID'], 'user')
 
-            for movie in user['movies']:
-                graph.add_edge(user['userID'], movie)
-
-            for music in user['music']:
-                graph.add_edge(user['userID'], music)
-
-            for food in user['food']:
-                graph.add_edge(user['userID'], food)
+            for category in constants.CATEGORIES:
+                graph._add_categories(user[category], category)
 
-            for game in user['games']:
-                graph.add_edge(user['userID'], game)
-
-        for user in users:
+                for preference in user[category]:
+                    graph.add_vertex(preference, 'preference')
+                    graph.add_edge(user['userID'], preference)
 
             for friend in user['friends']:
-                graph.add_edge(user['userID'], friend)
+                if friend in graph._vertices:
+                    graph.add_edge(user['userID'], friend)
+                else:
+                    pending.append((user['userID'], friend))
+
+        for user, friend in pending:
+            graph.add_edge(user, friend)
 
         return graph
 
@@ -382,9 +970,13 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'extra-imports': ['authenticate',
                           'constants',
+                          'preference_matrix',
+                          'minhash',
+                          'recommendation_cache',
                           'typing',
-                          'random',
+                          'heapq',
                           'logging',
+                          'time',
                           'webbrowser',
                           'dash',
                           'dash_html_components',
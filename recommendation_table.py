@@ -0,0 +1,260 @@
+"""File contains the RecommendationTable class, used to serve friend recommendations computed
+ahead of time
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import dbm
+import glob
+import math
+import os
+import shelve
+import time
+
+from authenticate import DataHandler
+from recommendation_graph import Graph, format_match
+import constants
+
+
+class RecommendationTable:
+    """A table of the top recommendations of every user, computed ahead of time by a batch job
+    and stored on disk, keyed by user id.
+
+    The entry of a user is a tuple (generated_at, preferences, friends, matches) where
+    generated_at is the time the entry was computed, preferences and friends are the sorted
+    preferences and friends the user had at that time, and matches are the (similarity score,
+    user) pairs of the user's top recommendations, as returned by Graph.get_top_matches.
+
+    The entries read are kept in memory until the table changes on disk, so that showing the
+    recommendations of a user again does not reopen the table.
+
+    Instance Attributes:
+        - path: the path of the table on disk
+        - limit: the number of recommendations stored for each user
+        - max_age: the number of seconds after which an entry is stale
+
+    Representation Invariants:
+        - self.limit >= 1
+        - self.max_age >= 0
+    """
+    path: str
+    limit: int
+    max_age: float
+
+    # Private Instance Attributes:
+    #     - _entries:
+    #         Maps the user ID of each user whose entry was read to their entry, or None if
+    #         they had no entry.
+    #     - _file_version:
+    #         The names and modification times of the files of the table when the entries in
+    #         _entries were read.
+    _entries: dict[str, Optional[tuple]]
+    _file_version: tuple
+
+    def __init__(self, path: str = constants.RECOMMENDATION_TABLE,
+                 limit: int = constants.RECOMMENDATION_TABLE_LIMIT,
+                 max_age: float = constants.RECOMMENDATION_TABLE_MAX_AGE) -> None:
+        """Initialize a table stored at <path>, which may not have been built yet."""
+        self.path = path
+        self.limit = limit
+        self.max_age = max_age
+
+        self._entries = {}
+        self._file_version = ()
+
+    @staticmethod
+    def get_table(handler: DataHandler) -> RecommendationTable:
+        """Return the recommendation table served to the screens of the handler, created the
+        first time it is used.
+        """
+        if handler.recommendation_table is None:
+            handler.recommendation_table = RecommendationTable()
+
+        return handler.recommendation_table
+
+    def build(self, graph: Graph) -> int:
+        """Compute the recommendations of every user in <graph>, replacing the whole table.
+
+        Return the number of users scored.
+        """
+        users = graph.get_all_vertices('user')
+
+        with shelve.open(self.path, flag='n') as table:
+            for user in users:
+                table[user] = self._compute_entry(graph, user)
+
+        return len(users)
+
+    def refresh(self, graph: Graph) -> int:
+        """Recompute only the entries that may have changed since the table was last updated.
+
+        A user has changed if their preferences or friends differ from the ones stored in their
+        entry, if they have no entry, or if their entry is stale. A change of preferences by a
+        user (including being added or removed) changes their similarity score with every user
+        sharing one of their old or new preferences, so all those users are scored again. A
+        change of friends only affects the user's own recommendations.
+
+        Return the number of users scored.
+        """
+        users = graph.get_all_vertices('user')
+        now = time.time()
+
+        changed = set()
+        changed_preferences = set()
+
+        with shelve.open(self.path, flag='c') as table:
+            for user in [user for user in table.keys() if user not in users]:
+                changed_preferences.update(table[user][1])
+                del table[user]
+
+            for user in users:
+                preferences, friends = RecommendationTable._get_fingerprint(graph, user)
+
+                if user not in table:
+                    changed.add(user)
+                    changed_preferences.update(preferences)
+                    continue
+
+                generated_at, old_preferences, old_friends, _ = table[user]
+
+                if old_preferences != preferences:
+                    changed.add(user)
+                    changed_preferences.update(old_preferences)
+                    changed_preferences.update(preferences)
+                elif old_friends != friends or now - generated_at > self.max_age:
+                    changed.add(user)
+
+            preferences = graph.get_all_vertices('preference')
+
+            for preference in changed_preferences:
+                if preference in preferences:
+                    changed.update(graph.get_neighbours(preference, 'user'))
+
+            for user in changed:
+                table[user] = self._compute_entry(graph, user)
+
+        return len(changed)
+
+    def get_top_matches(self, graph: Graph, user: str, limit: int,
+                        offset: int = 0) -> Optional[list[tuple[float, str]]]:
+        """Return the stored (similarity score, user) pairs recommended to <user>.
+
+        Return None if the table has not been built, if the user has no entry, if the entry is
+        stale, if the user's preferences or friends in <graph> differ from the ones the entry was
+        computed with, or if the entry does not hold enough pairs to fill the requested page.
+
+        Return None too if a pair up to the end of the page no longer matches <graph>: its user
+        was deleted, became a friend of <user>, or changed their preferences since the entry was
+        computed.
+
+        Preconditions:
+            - limit >= 1
+            - offset >= 0
+        """
+        entry = self._get_entry(user)
+
+        if entry is None:
+            return None
+
+        generated_at, preferences, friends, matches = entry
+
+        if time.time() - generated_at > self.max_age or \
+                (preferences, friends) != RecommendationTable._get_fingerprint(graph, user):
+            return None
+
+        # A full entry may have been cut off before the end of the requested page
+        if len(matches) == self.limit and offset + limit > self.limit:
+            return None
+
+        for score, other in matches[:offset + limit]:
+            if other == user or other in friends:
+                return None
+
+            try:
+                if not math.isclose(score, graph.get_similarity_score(user, other)):
+                    return None
+            except ValueError:
+                # The other user was deleted
+                return None
+
+        return matches[offset:offset + limit]
+
+    def recommend_friends(self, graph: Graph, user: str, limit: int,
+                          offset: int = 0) -> list[str]:
+        """Return the recommendations graph.recommend_friends(user, limit, offset) would return.
+
+        They are served from this table when the entry of the user is fresh, and computed on
+        <graph> otherwise.
+
+        Preconditions:
+            - user in graph.get_all_vertices('user')
+            - limit >= 1
+            - offset >= 0
+        """
+        matches = self.get_top_matches(graph, user, limit, offset)
+
+        if matches is None:
+            return graph.recommend_friends(user, limit, offset)
+
+        return [format_match(score, other) for score, other in matches]
+
+    def _get_entry(self, user: str) -> Optional[tuple]:
+        """Return the entry of <user>, or None if the table has not been built or the user has
+        no entry, reading it from disk only if it was not read since the table last changed.
+        """
+        file_version = tuple(sorted((name, os.stat(name).st_mtime_ns)
+                                    for name in glob.glob(glob.escape(self.path) + '*')))
+
+        if file_version != self._file_version:
+            self._entries = {}
+            self._file_version = file_version
+
+        if user not in self._entries:
+            try:
+                with shelve.open(self.path, flag='r') as table:
+                    self._entries[user] = table.get(user)
+            except dbm.error:
+                self._entries[user] = None
+
+        return self._entries[user]
+
+    def _compute_entry(self, graph: Graph, user: str) -> tuple:
+        """Return the table entry of <user>, computed on <graph>."""
+        preferences, friends = RecommendationTable._get_fingerprint(graph, user)
+
+        return time.time(), preferences, friends, graph.get_top_matches(user, self.limit)
+
+    @staticmethod
+    def _get_fingerprint(graph: Graph, user: str) -> tuple[tuple, tuple]:
+        """Return the sorted preferences and the sorted friends of <user> in <graph>."""
+        return (tuple(sorted(graph.get_neighbours(user, 'preference'))),
+                tuple(sorted(graph.get_neighbours(user, 'user'))))
+
+
+if __name__ == '__main__':
+    # The code below is the batch job that keeps the table up to date, and is meant to be run
+    # periodically:
+
+    #     from authenticate import DataHandler
+    #     RecommendationTable().refresh(Graph.load_friends_graph(DataHandler()))
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing',
+                          'dbm',
+                          'glob',
+                          'math',
+                          'os',
+                          'shelve',
+                          'time',
+                          'authenticate',
+                          'recommendation_graph',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
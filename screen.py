@@ -17,6 +17,7 @@ import constants
 from custom_exceptions import UserDoesNotExistsError, PrintingQuestionError
 from authenticate import DataHandler
 from recommendation_graph import Graph
+from recommendation_table import RecommendationTable
 
 
 class Screen:
@@ -331,6 +332,14 @@ class SignedIn(Screen):
 
             return Recommendations(self.handler, self, self.logged_in_as)
 
+        elif answer == 'see friends of your friends':
+
+            recommendations = Recommendations(self.handler, self, self.logged_in_as)
+
+            recommendations.friends_of_friends = True
+
+            return recommendations
+
         elif answer == 'change your preferences':
 
             answers = Screen.ask_multi_choice_question_cutie(constants.MESSAGES['header_message'],
@@ -343,10 +352,11 @@ class SignedIn(Screen):
         elif answer == 'your profile':
 
             data = self.handler.get_user_data(self.logged_in_as)
+            friends = self.handler.get_users(data.get('friends', []))
 
             doc = DocumentationScreen(self.handler, self, self.logged_in_as)
 
-            doc.add_details(constants.profile(data), is_path=False)
+            doc.add_details(constants.profile(data, friends), is_path=False)
 
             return doc
 
@@ -396,10 +406,12 @@ class SignedIn(Screen):
 
                 constants.DEPTH = did_change
 
-                graph = Graph.load_friends_graph(self.handler). \
-                    generate_users_graph_for_user(self.logged_in_as, constants.DEPTH)
+                with self.handler.graph_lock:
+                    graph = Graph.get_friends_graph(self.handler). \
+                        generate_users_graph_for_user(self.logged_in_as, constants.DEPTH,
+                                                      constants.MAX_NETWORK_VERTICES)
 
-                graph.plot()
+                graph.plot(root=self.logged_in_as)
 
                 Screen.ask_question_py_inquirer(constants.QUESTIONS['exit_question'])
 
@@ -414,7 +426,28 @@ class SignedIn(Screen):
 
 
 class Recommendations(Screen):
-    """Represents a friends Recommendation screen"""
+    """Represents a friends Recommendation screen
+
+    InstanceAttributes(additional from super class):
+    - offset: the number of recommendations shown on the pages before the current one
+    - friends_of_friends: whether to recommend the friends of the user's friends instead of
+    the users with the most similar preferences
+    """
+    offset: int
+    friends_of_friends: bool
+
+    def __init__(self, data_handler: DataHandler, previous_screen: Optional[Screen] = None,
+                 userID: Optional[str] = None) -> None:
+        """Initialize a recommendations screen showing the first page of recommendations
+
+        :param data_handler: A data handler object used to handle the data management
+        :param previous_screen: the parent screen of self
+        :param userID: The unique user id of a user
+        """
+        super().__init__(data_handler, previous_screen, userID)
+
+        self.offset = 0
+        self.friends_of_friends = False
 
     def show(self, clear_screen_before_present: bool = True) -> Screen:
         """Present the screen onto the terminal and return the next screen to be presented
@@ -427,9 +460,17 @@ class Recommendations(Screen):
 
         constants.print_logo()
 
-        graph = Graph.load_friends_graph(self.handler)
+        # One extra recommendation is asked for to know whether there is another page
+        with self.handler.graph_lock:
+            graph = Graph.get_friends_graph(self.handler)
 
-        recommendations = graph.recommend_friends(self.logged_in_as, 10)
+            if self.friends_of_friends:
+                recommendations = graph.recommend_friends_of_friends(
+                    self.logged_in_as, constants.RECOMMENDATIONS_PER_PAGE + 1, self.offset,
+                    constants.MUTUAL_FRIENDS_BLEND)
+            else:
+                recommendations = RecommendationTable.get_table(self.handler).recommend_friends(
+                    graph, self.logged_in_as, constants.RECOMMENDATIONS_PER_PAGE + 1, self.offset)
 
         if recommendations == []:
             doc = DocumentationScreen(self.handler, self.previous_screen, self.logged_in_as)
@@ -438,6 +479,9 @@ class Recommendations(Screen):
 
             return doc
 
+        if len(recommendations) > constants.RECOMMENDATIONS_PER_PAGE:
+            recommendations[-1] = constants.MORE_RECOMMENDATIONS
+
         recommendations.extend(['Exit'])
 
         question = constants.generate_question_with_choices(recommendations,
@@ -451,6 +495,10 @@ class Recommendations(Screen):
         elif answer == 'stay':
             return self
 
+        elif answer == constants.MORE_RECOMMENDATIONS:
+            self.offset += constants.RECOMMENDATIONS_PER_PAGE
+            return self
+
         else:
 
             user = answer.split(' ')[0]
@@ -487,7 +535,11 @@ class MyFriends(Screen):
 
         constants.print_logo()
 
-        friends = list(self.handler.get_user_data(self.logged_in_as).get('friends'))
+        friends = list(self.handler.get_user_data(self.logged_in_as).get('friends', []))
+
+        # The profiles of all the friends are read together, instead of one at a time as they
+        # are opened
+        friends_data = self.handler.get_users(friends)
 
         if friends == []:
 
@@ -509,6 +561,10 @@ class MyFriends(Screen):
             if answer == 'Exit':
                 return self.previous_screen
 
+            elif answer not in friends_data:
+                # The friend was deleted since the list was read, so show the list again
+                return self
+
             else:
 
                 options = ['Unfriend', 'Exit']
@@ -520,7 +576,7 @@ class MyFriends(Screen):
 
                 constants.print_logo()
 
-                print(constants.profile(self.handler.get_user_data(answer)))
+                print(constants.profile(friends_data[answer]))
 
                 sub_answer = Screen.ask_question_py_inquirer(question).get('options')
 
@@ -550,7 +606,7 @@ class SearchPeople(Screen):
 
         users = []
 
-        for user_data in self.handler.get_all_data():
+        for user_data in self.handler.iter_all_data(['userID']):
             users.append(user_data['userID'])
 
         search = self.search(users, query, 10)
@@ -569,9 +625,14 @@ class SearchPeople(Screen):
             return self
         else:
             options = ['Exit']
-            user_data = self.handler.get_user_data(answer)
+            users = self.handler.get_users([answer, self.logged_in_as])
+            user_data = users.get(answer)
+
+            if user_data is None:
+                # The user was deleted since the search, so search again
+                return self
 
-            if answer in self.handler.get_user_data(self.logged_in_as).get('friends'):
+            if answer in users.get(self.logged_in_as, {}).get('friends', []):
                 options.insert(0, f'Unfriend {answer}')
             else:
                 if answer != self.logged_in_as:
@@ -666,6 +727,7 @@ if __name__ == '__main__':
                           'cutie',
                           'authenticate',
                           'recommendation_graph',
+                          'recommendation_table',
                           'difflib'],
         'allowed-io': ['ask_question_py_inquirer',
                        'ask_multi_choice_question_cutie',
@@ -0,0 +1,403 @@
+"""File contains the SQLiteBackend class, which stores the users of the app in a local SQLite
+database file, so that the app can run without a connection to the firebase server
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+
+import json
+import sqlite3
+import threading
+import time
+
+from custom_exceptions import DataDidNotLoadError
+from instrumentation import Instrumentation
+from storage import DocumentChange, StorageBackend
+import constants
+
+# The most user IDs bound to one statement, below the limit of every SQLite version
+_MAX_VARIABLES = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    document TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_by_updated_at ON users (updated_at);
+CREATE TABLE IF NOT EXISTS preferences (
+    category TEXT NOT NULL,
+    preference TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (category, preference, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS preferences_by_user ON preferences (user_id);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    changed_at REAL NOT NULL,
+    removed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_by_user ON changes (user_id);
+CREATE INDEX IF NOT EXISTS changes_by_changed_at ON changes (changed_at);
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    """A storage backend keeping the users in a SQLite database file.
+
+    The document of each user is stored as JSON in the users table, keyed by user ID, with the
+    time it was last written in its own indexed column. The preferences table holds one row for
+    each preference liked by each user, keyed by preference first, so that the users who like a
+    preference are found from the index alone. The changes table logs the last change of each
+    user in the order they were made, which listen polls for new changes.
+
+    Every method runs in a single transaction, so each of them is atomic like the batched
+    writes of FirestoreBackend, and the backend can be shared by several threads.
+
+    Instance Attributes:
+        - path: the path of the database file
+        - poll_interval: the number of seconds between two reads of the new changes by listen
+    """
+    path: str
+    poll_interval: float
+
+    # Private Instance Attributes:
+    #     - _connection:
+    #         The connection to the database.
+    #     - _lock:
+    #         The lock held while the connection is used.
+    #     - _instrumentation:
+    #         The instrumentation recording the operations of this backend, or None.
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+    _instrumentation: Optional[Instrumentation]
+
+    def __init__(self, path: str = constants.SQLITE_DATABASE) -> None:
+        """Initialize a backend storing the users in the database file at <path>, which is
+        created if it does not exist.
+        """
+        self.path = path
+        self.batch_size = constants.SQLITE_BATCH_SIZE
+        self.poll_interval = constants.SQLITE_POLL_INTERVAL
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._instrumentation = None
+
+    def instrument(self, instrumentation: Instrumentation) -> None:
+        """Record the reads, writes and deletes made by this backend in <instrumentation>."""
+        self._instrumentation = instrumentation
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        """Return the document of the given user, or None if the user does not exist."""
+        return self.get_users([user_id]).get(user_id)
+
+    def get_users(self, user_ids: list[str],
+                  fields: Optional[list[str]] = None) -> dict[str, dict]:
+        """Return the documents of the given users who exist, keyed by user ID, with only the
+        given fields if <fields> is not None.
+        """
+        users = {}
+
+        with self._transaction() as cursor:
+            for start in range(0, len(user_ids), _MAX_VARIABLES):
+                chunk = user_ids[start:start + _MAX_VARIABLES]
+                cursor.execute('SELECT user_id, document, updated_at FROM users '
+                               f'WHERE user_id IN ({", ".join("?" * len(chunk))})', chunk)
+
+                for user_id, document, updated_at in cursor.fetchall():
+                    users[user_id] = SQLiteBackend._decode(document, updated_at, fields)
+
+        self._record('reads', len(users))
+
+        return users
+
+    def iter_users(self, fields: Optional[list[str]], page_size: int) -> Iterator[dict]:
+        """Yield the documents of all the users in order of user ID, with only the given fields
+        if <fields> is not None, reading <page_size> users at a time.
+
+        Preconditions:
+            - page_size >= 1
+        """
+        last = ''
+        rows = None
+
+        while rows is None or len(rows) == page_size:
+            with self._transaction() as cursor:
+                cursor.execute('SELECT user_id, document, updated_at FROM users '
+                               'WHERE user_id > ? ORDER BY user_id LIMIT ?', (last, page_size))
+                rows = cursor.fetchall()
+
+            self._record('reads', len(rows))
+
+            for user_id, document, updated_at in rows:
+                last = user_id
+                yield SQLiteBackend._decode(document, updated_at, fields)
+
+    def get_user_ids(self) -> list[str]:
+        """Return the user IDs of all the users, without reading their documents."""
+        with self._transaction() as cursor:
+            cursor.execute('SELECT user_id FROM users ORDER BY user_id')
+            return [user_id for (user_id,) in cursor.fetchall()]
+
+    def get_users_updated_since(self, timestamp: float) -> list[dict]:
+        """Return the documents of the users written after <timestamp>, a time in seconds since
+        the epoch.
+        """
+        with self._transaction() as cursor:
+            cursor.execute('SELECT document, updated_at FROM users WHERE updated_at > ?',
+                           (timestamp,))
+            users = [SQLiteBackend._decode(document, updated_at, None)
+                     for document, updated_at in cursor.fetchall()]
+
+        self._record('reads', len(users))
+
+        return users
+
+    def get_user_ids_deleted_since(self, timestamp: float) -> list[str]:
+        """Return the user IDs of the users deleted after <timestamp>, a time in seconds since
+        the epoch, and not registered again since, as logged in the changes table.
+        """
+        with self._transaction() as cursor:
+            cursor.execute('SELECT user_id FROM changes WHERE changed_at > ? AND removed = 1',
+                           (timestamp,))
+            return [user_id for (user_id,) in cursor.fetchall()]
+
+    def get_user_ids_with_preference(self, category: str, preference: str) -> list[str]:
+        """Return the user IDs of the users who like <preference> in the given category."""
+        with self._transaction() as cursor:
+            cursor.execute('SELECT user_id FROM preferences WHERE category = ? AND preference = ? '
+                           'ORDER BY user_id', (category, preference))
+            return [user_id for (user_id,) in cursor.fetchall()]
+
+    def set_user(self, user_id: str, user_data: dict, merge: bool = False) -> None:
+        """Write the document of the given user. If <merge> is True, only the fields in
+        <user_data> are changed; otherwise the whole document is replaced by <user_data>.
+        """
+        with self._transaction() as cursor:
+            document = SQLiteBackend._read(cursor, user_id) if merge else None
+            self._write(cursor, user_id, {**(document or {}), **user_data})
+
+    def add_users(self, users: list[dict]) -> None:
+        """Write the documents of the given new users in a single transaction.
+
+        Preconditions:
+            - len(users) <= self.batch_size
+        """
+        with self._transaction() as cursor:
+            for user_data in users:
+                self._write(cursor, user_data['userID'], user_data)
+
+    def set_friendship(self, user1: str, user2: str, friends: bool) -> None:
+        """Add each of the two users to the friends of the other, or remove them if <friends>
+        is False, in a single transaction.
+
+        Preconditions:
+            - user1 and user2 exist
+        """
+        with self._transaction() as cursor:
+            for user, friend in ((user1, user2), (user2, user1)):
+                document = SQLiteBackend._read(cursor, user)
+
+                if friends and friend not in document['friends']:
+                    document['friends'].append(friend)
+                elif not friends and friend in document['friends']:
+                    document['friends'].remove(friend)
+
+                self._write(cursor, user, document)
+
+    def remove_friendships(self, user_id: str, friends: list[str], delete: bool) -> None:
+        """Remove both sides of the friendships of the given user with <friends>, and delete the
+        user too if <delete> is True, in a single transaction.
+
+        Preconditions:
+            - len(friends) < self.batch_size - 1
+        """
+        with self._transaction() as cursor:
+            for friend in friends:
+                document = SQLiteBackend._read(cursor, friend)
+
+                if document is not None:
+                    document['friends'] = [other for other in document['friends']
+                                           if other != user_id]
+                    self._write(cursor, friend, document)
+
+            if delete:
+                cursor.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
+                cursor.execute('DELETE FROM preferences WHERE user_id = ?', (user_id,))
+                SQLiteBackend._log_change(cursor, user_id, time.time(), True)
+                self._record('deletes', 1)
+            else:
+                document = SQLiteBackend._read(cursor, user_id)
+                document['friends'] = [other for other in document['friends']
+                                       if other not in friends]
+                self._write(cursor, user_id, document)
+
+    def listen(self, callback: Callable[[list[DocumentChange]], None]) -> Callable[[], None]:
+        """Call <callback> with the changes of the users, in the order they were made, on a
+        background thread, until the returned function is called.
+
+        Every existing user is first reported as 'added', one page at a time, and the changes
+        logged since then are read every self.poll_interval seconds, including those made by
+        other processes using the same database file.
+        """
+        stop = threading.Event()
+        thread = threading.Thread(target=self._poll_changes, args=(callback, stop), daemon=True)
+        thread.start()
+
+        def unsubscribe() -> None:
+            stop.set()
+
+            if threading.current_thread() is not thread:
+                thread.join()
+
+        return unsubscribe
+
+    def _poll_changes(self, callback: Callable[[list[DocumentChange]], None],
+                      stop: threading.Event) -> None:
+        """Report every existing user, then the changes logged since, to <callback> until
+        <stop> is set.
+
+        The reads that fail, e.g. because another process holds the database, are retried at
+        the next poll.
+        """
+        with self._transaction() as cursor:
+            cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM changes')
+            last = cursor.fetchone()[0]
+
+        # The users reported as existing
+        known = set()
+        page = []
+
+        for user_data in self.iter_users(None, constants.PAGE_SIZE):
+            known.add(user_data['userID'])
+            page.append(DocumentChange('added', user_data['userID'], user_data, time.time()))
+
+            if len(page) == constants.PAGE_SIZE:
+                callback(page)
+                page = []
+
+        callback(page)
+
+        while not stop.wait(self.poll_interval):
+            try:
+                with self._transaction() as cursor:
+                    cursor.execute('SELECT changes.seq, changes.user_id, changes.changed_at, '
+                                   'changes.removed, users.document, users.updated_at '
+                                   'FROM changes LEFT JOIN users USING (user_id) '
+                                   'WHERE changes.seq > ? ORDER BY changes.seq', (last,))
+                    rows = cursor.fetchall()
+            except DataDidNotLoadError:
+                continue
+
+            changes = []
+
+            for seq, user_id, changed_at, removed, document, updated_at in rows:
+                last = seq
+
+                if removed and user_id in known:
+                    known.remove(user_id)
+                    changes.append(DocumentChange('removed', user_id, None, changed_at))
+                elif not removed and document is not None:
+                    kind = 'modified' if user_id in known else 'added'
+                    known.add(user_id)
+                    changes.append(DocumentChange(kind, user_id,
+                                                  SQLiteBackend._decode(document, updated_at, None),
+                                                  changed_at))
+
+            if changes:
+                callback(changes)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Return a context in which the statements run with the returned cursor form a single
+        transaction, committed when the context exits and rolled back if it fails.
+        """
+        with self._lock:
+            try:
+                with self._connection:
+                    yield self._connection.cursor()
+            except sqlite3.Error:
+                raise DataDidNotLoadError
+
+    def _write(self, cursor: sqlite3.Cursor, user_id: str, user_data: dict) -> None:
+        """Replace the document of the given user by <user_data>, and their preferences by the
+        preferences in it. The time of the write replaces any 'updatedAt' in <user_data>.
+        """
+        document = {key: value for key, value in user_data.items() if key != 'updatedAt'}
+        updated_at = time.time()
+
+        cursor.execute('INSERT OR REPLACE INTO users (user_id, document, updated_at) '
+                       'VALUES (?, ?, ?)', (user_id, json.dumps(document), updated_at))
+        cursor.execute('DELETE FROM preferences WHERE user_id = ?', (user_id,))
+        cursor.executemany('INSERT OR IGNORE INTO preferences (category, preference, user_id) '
+                           'VALUES (?, ?, ?)',
+                           [(category, preference, user_id) for category in constants.CATEGORIES
+                            for preference in document.get(category, [])])
+        SQLiteBackend._log_change(cursor, user_id, updated_at, False)
+
+        self._record('writes', 1)
+
+    def _record(self, operation: str, count: int) -> None:
+        """Record <count> operations of the given kind, if this backend is instrumented."""
+        if self._instrumentation is not None and count > 0:
+            self._instrumentation.record(operation, count)
+
+    @staticmethod
+    def _log_change(cursor: sqlite3.Cursor, user_id: str, changed_at: float,
+                    removed: bool) -> None:
+        """Log a change of the given user made at <changed_at>, replacing the previous change
+        logged for them, so that the log holds at most one change per user.
+        """
+        cursor.execute('DELETE FROM changes WHERE user_id = ?', (user_id,))
+        cursor.execute('INSERT INTO changes (user_id, changed_at, removed) VALUES (?, ?, ?)',
+                       (user_id, changed_at, int(removed)))
+
+    @staticmethod
+    def _read(cursor: sqlite3.Cursor, user_id: str) -> Optional[dict]:
+        """Return the stored document of the given user, or None if the user does not exist."""
+        cursor.execute('SELECT document FROM users WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+
+        return json.loads(row[0]) if row is not None else None
+
+    @staticmethod
+    def _decode(document: str, updated_at: float, fields: Optional[list[str]]) -> dict:
+        """Return the document of a user stored as <document> and written at <updated_at>, with
+        only the given fields if <fields> is not None.
+        """
+        user_data = json.loads(document)
+        user_data['updatedAt'] = datetime.fromtimestamp(updated_at, timezone.utc)
+
+        if fields is None:
+            return user_data
+
+        return {field: user_data[field] for field in fields if field in user_data}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['contextlib',
+                          'datetime',
+                          'typing',
+                          'json',
+                          'sqlite3',
+                          'threading',
+                          'time',
+                          'custom_exceptions',
+                          'instrumentation',
+                          'storage',
+                          'constants'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
@@ -0,0 +1,158 @@
+"""File contains the StorageBackend class, the interface of the databases the users of the app
+can be stored in
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from typing import Callable, Iterator, Optional
+
+from instrumentation import Instrumentation
+
+
+class DocumentChange:
+    """A change of the document of a user, as reported by StorageBackend.listen.
+
+    Instance Attributes:
+        - kind: whether the user was 'added', 'modified' or 'removed'
+        - user_id: the user ID of the user
+        - user_data: the document of the user after the change, or None if they were removed
+        - timestamp: the time the change was read from the database, in seconds since the epoch
+
+    Representation Invariants:
+        - self.kind in {'added', 'modified', 'removed'}
+        - (self.kind == 'removed') == (self.user_data is None)
+    """
+    kind: str
+    user_id: str
+    user_data: Optional[dict]
+    timestamp: float
+
+    def __init__(self, kind: str, user_id: str, user_data: Optional[dict],
+                 timestamp: float) -> None:
+        """Initialize a change of the given kind of the document of a user."""
+        self.kind = kind
+        self.user_id = user_id
+        self.user_data = user_data
+        self.timestamp = timestamp
+
+
+class StorageBackend:
+    """A database storing one document per user, keyed by user ID, which DataHandler reads and
+    writes the users through.
+
+    The document of a user is a dictionary holding the fields 'userID', 'friends' and one list
+    of preferences for each category in constants.CATEGORIES, plus 'updatedAt', the time it was
+    last written, which is set by the backend.
+
+    Every method raises DataDidNotLoadError if the database can not be reached, and ValueError
+    or TypeError if the given data can not be stored.
+
+    This is an abstract class. Only subclasses should be instantiated.
+
+    Instance Attributes:
+        - batch_size: the maximum number of users written by one call of add_users or
+          remove_friendships (counting the user whose friendships are removed)
+
+    Representation Invariants:
+        - self.batch_size >= 2
+    """
+    batch_size: int
+
+    def instrument(self, instrumentation: Instrumentation) -> None:
+        """Record the reads, writes and deletes made by this backend in <instrumentation>."""
+        raise NotImplementedError
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        """Return the document of the given user, or None if the user does not exist."""
+        raise NotImplementedError
+
+    def get_users(self, user_ids: list[str],
+                  fields: Optional[list[str]] = None) -> dict[str, dict]:
+        """Return the documents of the given users who exist, keyed by user ID, with only the
+        given fields if <fields> is not None. The users are read together.
+        """
+        raise NotImplementedError
+
+    def iter_users(self, fields: Optional[list[str]], page_size: int) -> Iterator[dict]:
+        """Yield the documents of all the users in order of user ID, with only the given fields
+        if <fields> is not None, reading <page_size> users at a time.
+
+        Preconditions:
+            - page_size >= 1
+        """
+        raise NotImplementedError
+
+    def get_user_ids(self) -> list[str]:
+        """Return the user IDs of all the users, without reading their documents."""
+        raise NotImplementedError
+
+    def get_users_updated_since(self, timestamp: float) -> list[dict]:
+        """Return the documents of the users written after <timestamp>, a time in seconds since
+        the epoch.
+        """
+        raise NotImplementedError
+
+    def get_user_ids_deleted_since(self, timestamp: float) -> list[str]:
+        """Return the user IDs of the users deleted after <timestamp>, a time in seconds since
+        the epoch. A user may have been registered again since.
+        """
+        raise NotImplementedError
+
+    def get_user_ids_with_preference(self, category: str, preference: str) -> list[str]:
+        """Return the user IDs of the users who like <preference> in the given category."""
+        raise NotImplementedError
+
+    def set_user(self, user_id: str, user_data: dict, merge: bool = False) -> None:
+        """Write the document of the given user. If <merge> is True, only the fields in
+        <user_data> are changed and the user must exist; otherwise the whole document is
+        replaced by <user_data>.
+        """
+        raise NotImplementedError
+
+    def add_users(self, users: list[dict]) -> None:
+        """Write the documents of the given new users together, each keyed by its 'userID'.
+
+        Preconditions:
+            - len(users) <= self.batch_size
+        """
+        raise NotImplementedError
+
+    def set_friendship(self, user1: str, user2: str, friends: bool) -> None:
+        """Add each of the two users to the friends of the other, or remove them if <friends>
+        is False, atomically and without overwriting any other change of their friends.
+
+        Preconditions:
+            - user1 and user2 exist
+        """
+        raise NotImplementedError
+
+    def remove_friendships(self, user_id: str, friends: list[str], delete: bool) -> None:
+        """Remove both sides of the friendships of the given user with <friends> atomically,
+        ignoring the friends who do not exist, and delete the user too if <delete> is True. The
+        deletion is recorded for get_user_ids_deleted_since in the same write.
+
+        Preconditions:
+            - len(friends) < self.batch_size - 1
+        """
+        raise NotImplementedError
+
+    def listen(self, callback: Callable[[list[DocumentChange]], None]) -> Callable[[], None]:
+        """Call <callback> with the changes of the users, in the order they were made, on a
+        background thread, until the returned function is called.
+
+        The first call reports every existing user as 'added'.
+        """
+        raise NotImplementedError
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing',
+                          'instrumentation'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })
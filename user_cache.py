@@ -0,0 +1,159 @@
+"""File contains the UserCache class, used by DataHandler to serve user documents it has recently
+read or written without reading them from the firebase database again
+
+By Eeshan Narula and Avnish Pasari
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import copy
+import threading
+import time
+
+
+class UserCache:
+    """A bounded cache of user documents that expire a fixed time after they were cached, and are
+    evicted least recently used first when the cache is full.
+
+    The cache only holds users that exist: a user who is not in the cache may or may not exist.
+    The documents are copied on the way in and out, so that the callers can change the returned
+    data without changing the cached one. The cache can be used by several threads, e.g. the
+    thread of a ChangeFeed refreshing it.
+
+    Instance Attributes:
+        - capacity: the maximum number of documents kept
+        - ttl: the number of seconds a document is served for after it was cached
+        - hits: the number of lookups that found a fresh document
+        - misses: the number of lookups that did not
+        - evictions: the number of documents evicted to make room for a new one
+
+    Representation Invariants:
+        - self.capacity >= 1
+        - self.ttl >= 0
+    """
+    capacity: int
+    ttl: float
+    hits: int
+    misses: int
+    evictions: int
+
+    # Private Instance Attributes:
+    #     - _documents:
+    #         Maps a user ID to the time its document expires and the document,
+    #         from the least to the most recently used.
+    #     - _lock:
+    #         The lock held while the documents are used.
+    _documents: OrderedDict[str, tuple[float, dict]]
+    _lock: threading.RLock
+
+    def __init__(self, capacity: int, ttl: float) -> None:
+        """Initialize an empty cache of up to <capacity> documents, each kept for <ttl> seconds.
+
+        Preconditions:
+            - capacity >= 1
+            - ttl >= 0
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._documents = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, user_id: str) -> Optional[dict]:
+        """Return a copy of the cached document of the given user, or None if there is no fresh
+        document for them.
+        """
+        with self._lock:
+            entry = self._documents.get(user_id)
+
+            if entry is None or entry[0] <= time.monotonic():
+                self._documents.pop(user_id, None)
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._documents.move_to_end(user_id)
+
+        return copy.deepcopy(entry[1])
+
+    def put(self, user_id: str, user_data: dict) -> None:
+        """Cache a copy of the whole document of the given user.
+
+        Fields set to a value computed by the server, such as firestore.SERVER_TIMESTAMP, must
+        be left out of <user_data>.
+        """
+        document = copy.deepcopy(user_data)
+
+        with self._lock:
+            self._documents[user_id] = (time.monotonic() + self.ttl, document)
+            self._documents.move_to_end(user_id)
+
+            if len(self._documents) > self.capacity:
+                self._documents.popitem(last=False)
+                self.evictions += 1
+
+    def merge(self, user_id: str, user_data: dict, unknown_fields: Iterable[str] = ()) -> None:
+        """Update the cached document of the given user with the fields in <user_data>, as
+        merged into the document in the database, and drop the <unknown_fields> whose new value
+        was computed by the server. Do nothing if there is no fresh document for the user, since
+        the rest of the document is not known.
+
+        The document expires as if it had just been cached.
+        """
+        with self._lock:
+            entry = self._documents.get(user_id)
+
+            if entry is not None and entry[0] > time.monotonic():
+                document = {**entry[1], **user_data}
+
+                for field in unknown_fields:
+                    document.pop(field, None)
+
+                self.put(user_id, document)
+
+    def refresh(self, user_id: str, user_data: dict) -> None:
+        """Replace the cached document of the given user, fresh or not, by a copy of
+        <user_data>, the whole document read from the database. Do nothing if the user is not
+        cached, so that refreshing every user does not evict the users in use.
+
+        The document expires as if it had just been cached.
+        """
+        with self._lock:
+            if user_id in self._documents:
+                self.put(user_id, user_data)
+
+    def remove(self, user_id: str) -> None:
+        """Remove the document of the given user from this cache, if it is cached."""
+        with self._lock:
+            self._documents.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Remove every document from this cache."""
+        with self._lock:
+            self._documents.clear()
+
+    def get_stats(self) -> dict[str, int]:
+        """Return the counters of this cache and its current size."""
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._documents)}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['collections',
+                          'typing',
+                          'copy',
+                          'threading',
+                          'time'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        'disable': ['E1136']
+    })